@@ -58,6 +58,10 @@ class ContentAdmin(admin.ModelAdmin):
     list_display = ('module', 'content_type', 'item')
     list_filter = ('module',)
 
+    def get_queryset(self, request):
+        return (super().get_queryset(request)
+                .select_related('module__course').with_items('title'))
+
 
 @admin.register(Text)
 class TextAdmin(admin.ModelAdmin):
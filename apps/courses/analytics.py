@@ -0,0 +1,151 @@
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .jobs import run_later
+from .models import (CompletedContent, Course, CourseDailyStats, Enrollment, Review,
+                     RollupState)
+
+ROLLUP_NAME = 'engagement'
+# days recomputed per transaction during a backfill
+ROLLUP_BATCH_DAYS = 31
+RATINGS = range(1, 6)
+DAY = datetime.timedelta(days=1)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _per_course_day(queryset, field, course, start, end, **aggregates):
+    # a range scan over the timestamp index, grouped in the database
+    return (queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+            .annotate(day=TruncDate(field)).values('day', course_pk=F(course))
+            .annotate(**aggregates).order_by())
+
+
+def rollup_days(first, last):
+    """
+    Recomputes the CourseDailyStats rows of the days ``first`` to ``last``
+    (both included) from the raw tables, replacing whatever was there.
+    """
+    start, end = _day_start(first), _day_start(last + DAY)
+    stats = {}
+
+    def row(values):
+        key = (values['course_pk'], values['day'])
+        if key not in stats:
+            stats[key] = CourseDailyStats(course_id=key[0], day=key[1])
+        return stats[key]
+
+    for values in _per_course_day(Enrollment.objects, 'enrolled_at', 'course_id', start, end,
+                                  total=Count('id')):
+        row(values).enrollments = values['total']
+
+    for values in _per_course_day(CompletedContent.objects, 'completed_at',
+                                  'content__module__course_id', start, end,
+                                  total=Count('id'), users=Count('user', distinct=True)):
+        stats_row = row(values)
+        stats_row.completions, stats_row.active_learners = values['total'], values['users']
+
+    ratings = {f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in RATINGS}
+    for values in _per_course_day(Review.objects, 'created_at', 'course_id', start, end,
+                                  total=Count('id'), **ratings):
+        stats_row = row(values)
+        stats_row.reviews = values['total']
+        for name in ratings:
+            setattr(stats_row, name, values[name])
+
+    # courses purged meanwhile would break the foreign key
+    existing = set(Course.all_objects.filter(
+        pk__in={course_id for course_id, _ in stats}).values_list('pk', flat=True))
+    CourseDailyStats.objects.filter(day__gte=first, day__lte=last).delete()
+    CourseDailyStats.objects.bulk_create(
+        [stats_row for (course_id, _), stats_row in stats.items() if course_id in existing],
+        batch_size=500)
+    return len(stats)
+
+
+def _locked_state(day):
+    # the RollupState row lock makes concurrent runs take turns, so two of
+    # them never delete and re-insert the same days at once
+    RollupState.objects.get_or_create(name=ROLLUP_NAME, defaults={'day': day})
+    return RollupState.objects.select_for_update().get(name=ROLLUP_NAME)
+
+
+def _first_activity_day():
+    firsts = [
+        Enrollment.objects.aggregate(first=Min('enrolled_at'))['first'],
+        CompletedContent.objects.aggregate(first=Min('completed_at'))['first'],
+        Review.objects.aggregate(first=Min('created_at'))['first'],
+    ]
+    firsts = [first for first in firsts if first is not None]
+    return timezone.localdate(min(firsts)) if firsts else None
+
+
+def rollup_engagement(since=None):
+    """
+    Brings the daily rollups up to date, starting from the high-water mark
+    (or ``since``, to backfill). Yesterday and today stay open and are
+    recomputed by the next run, so rows committed around midnight are not
+    lost. Returns the number of days processed.
+    """
+    today = timezone.localdate()
+    if since is None:
+        since = RollupState.objects.filter(name=ROLLUP_NAME).values_list(
+            'day', flat=True).first() or _first_activity_day() or today
+
+    first = since
+    while first <= today:
+        last = min(first + (ROLLUP_BATCH_DAYS - 1) * DAY, today)
+        with transaction.atomic():
+            state = _locked_state(first)
+            rollup_days(first, last)
+            # saved after every batch, so an interrupted backfill resumes here
+            state.day = min(last + DAY, today - DAY)
+            state.save()
+        first = last + DAY
+    return max((today - since).days + 1, 0)
+
+
+def rollup_state():
+    return RollupState.objects.filter(name=ROLLUP_NAME).first()
+
+
+def schedule_rollup(state):
+    # a dashboard view starts a background run only once the last one is
+    # ENGAGEMENT_ROLLUP_INTERVAL seconds old; None leaves it to the
+    # rollup_engagement command. The first run is a full-history backfill,
+    # which is left to the command too
+    interval = getattr(settings, 'ENGAGEMENT_ROLLUP_INTERVAL', None)
+    if interval is None or state is None:
+        return
+    if state.updated_at < timezone.now() - datetime.timedelta(seconds=interval):
+        run_later(0, rollup_engagement)
+
+
+def engagement(courses, since):
+    """
+    Totals per course and per day for the dashboard, from CourseDailyStats
+    only: the cost depends on courses x days, never on the raw tables.
+    """
+    stats = CourseDailyStats.objects.filter(course__in=courses, day__gte=since)
+    ratings = {f'rating_{rating}': Sum(f'rating_{rating}') for rating in RATINGS}
+    per_course = list(
+        stats.values('course', 'course__title').annotate(
+            enrollments=Sum('enrollments'), completions=Sum('completions'),
+            peak_active=Max('active_learners'), reviews=Sum('reviews'), **ratings)
+        .order_by('course__title'))
+    # active_learners is distinct per course only: across courses it is a
+    # sum, and a student active in two courses counts twice
+    per_day = list(
+        stats.values('day').annotate(
+            enrollments=Sum('enrollments'), completions=Sum('completions'),
+            active_learners=Sum('active_learners'), reviews=Sum('reviews'))
+        .order_by('day'))
+
+    histogram = [(rating, sum(row[f'rating_{rating}'] for row in per_course))
+                 for rating in RATINGS]
+    return per_course, per_day, histogram
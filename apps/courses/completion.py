@@ -0,0 +1,110 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from .models import CompletedContent, Content, Course, CourseCompletion
+from .outline import bump_outline_version
+
+
+def allocate_slots(course_id, count=1):
+    with transaction.atomic():
+        first = Course.objects.select_for_update().filter(pk=course_id).values_list(
+            'content_slots', flat=True).first()
+        if first is None:
+            return None
+        Course.objects.filter(pk=course_id).update(content_slots=F('content_slots') + count)
+    return range(first, first + count)
+
+
+def content_slot(content):
+    # contents loaded from fixtures get their slot on first use
+    if content.slot is None:
+        slots = allocate_slots(content.module.course_id)
+        if slots is None:
+            raise Course.DoesNotExist('The course of this content was deleted.')
+        content.slot = slots[0]
+        Content.objects.filter(pk=content.pk, slot__isnull=True).update(slot=content.slot)
+        bump_outline_version(pk=content.module.course_id)
+    return content.slot
+
+
+def set_completed(user_id, course_id, slot):
+    # the row lock makes the read-modify-write of the bitmap atomic
+    with transaction.atomic():
+        completion, _ = CourseCompletion.objects.select_for_update().get_or_create(
+            user_id=user_id, course_id=course_id)
+        if completion.add(slot):
+            completion.save(update_fields=['bits', 'completed_count', 'updated_at'])
+
+
+def clear_completed(user_id, course_id, slot):
+    with transaction.atomic():
+        completion = CourseCompletion.objects.select_for_update().filter(
+            user_id=user_id, course_id=course_id).first()
+        if completion is not None and completion.discard(slot):
+            completion.save(update_fields=['bits', 'completed_count', 'updated_at'])
+
+
+def forget_slots(slots, **course_lookups):
+    # contents that left the course: clear their bits so the counts stay exact
+    slots = [slot for slot in slots if slot is not None]
+    if not slots:
+        return
+    completions = CourseCompletion.objects.filter(
+        **{f'course__{lookup}': value for lookup, value in course_lookups.items()})
+    with transaction.atomic():
+        for completion in completions.select_for_update().iterator(chunk_size=500):
+            if any([completion.discard(slot) for slot in slots]):
+                completion.save(update_fields=['bits', 'completed_count', 'updated_at'])
+
+
+def mark_completed(user, content):
+    # CompletedContent is the record of a completion, with the timestamp the
+    # engagement rollup and the exports read; the bitmap is only a read index
+    # over it for the lesson views, kept in step here and rebuilt by
+    # import_completed_rows(). The INSERT is ON CONFLICT DO NOTHING, so double
+    # submits cannot race into the (user, content) unique constraint
+    slot = content_slot(content)
+    CompletedContent.objects.bulk_create(
+        [CompletedContent(user=user, content=content)], ignore_conflicts=True)
+    set_completed(user.pk, content.module.course_id, slot)
+
+
+def completion_for(user, course):
+    return CourseCompletion.objects.filter(user=user, course=course).first()
+
+
+def assign_missing_slots():
+    contents = (Content.objects.filter(slot__isnull=True)
+                .order_by('module__course', 'module__order', 'order', 'id')
+                .values_list('id', 'module__course_id'))
+    by_course = defaultdict(list)
+    for content_id, course_id in contents:
+        by_course[course_id].append(content_id)
+
+    for course_id, content_ids in by_course.items():
+        slots = allocate_slots(course_id, len(content_ids))
+        Content.objects.bulk_update(
+            [Content(id=content_id, slot=slot) for content_id, slot in zip(content_ids, slots)],
+            ['slot'], batch_size=500)
+        bump_outline_version(pk=course_id)
+    return sum(len(ids) for ids in by_course.values())
+
+
+def import_completed_rows():
+    # ORs the CompletedContent rows into the bitmaps; never clears a bit, so
+    # it is safe to run again
+    rows = CompletedContent.objects.filter(content__slot__isnull=False).values_list(
+        'user_id', 'content__module__course_id', 'content__slot')
+    slots = defaultdict(set)
+    for user_id, course_id, slot in rows.iterator(chunk_size=2000):
+        slots[user_id, course_id].add(slot)
+
+    updated = 0
+    for (user_id, course_id), course_slots in slots.items():
+        with transaction.atomic():
+            completion, _ = CourseCompletion.objects.select_for_update().get_or_create(
+                user_id=user_id, course_id=course_id)
+            if any([completion.add(slot) for slot in course_slots]):
+                completion.save(update_fields=['bits', 'completed_count', 'updated_at'])
+                updated += 1
+    return updated
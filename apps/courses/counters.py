@@ -0,0 +1,72 @@
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from .models import Content, Course, Module, Review
+
+
+def adjust_module_contents(module_id, delta):
+    Module.objects.filter(pk=module_id).update(content_count=F('content_count') + delta)
+    Course.objects.filter(modules=module_id).update(
+        content_count=F('content_count') + delta)
+
+
+def adjust_course_modules(course_id, modules_delta, contents_delta=0):
+    Course.objects.filter(pk=course_id).update(
+        module_count=F('module_count') + modules_delta,
+        content_count=F('content_count') + contents_delta)
+
+
+def _average(total, count):
+    return Coalesce(Cast(total, FloatField()) / NullIf(count, 0), Value(0.0))
+
+
+def adjust_course_reviews(course_id, count_delta, rating_delta):
+    # one UPDATE: the SET expressions all see the row as it was before
+    count = F('review_count') + count_delta
+    total = F('rating_sum') + rating_delta
+    Course.objects.filter(pk=course_id).update(
+        review_count=count, rating_sum=total, rating=_average(total, count))
+
+
+def _count(queryset, field, aggregate=Count('id')):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=aggregate).values('total')), Value(0))
+
+
+def counted_modules():
+    return Module.objects.annotate(actual_contents=_count(Content.objects, 'module'))
+
+
+def _course_counts():
+    return {
+        'module_count': _count(Module.objects, 'course'),
+        'content_count': _count(Content.objects, 'module__course'),
+        'review_count': _count(Review.objects, 'course'),
+        'rating_sum': _count(Review.objects, 'course', Sum('rating')),
+    }
+
+
+def counted_courses():
+    return Course.objects.annotate(
+        **{f'actual_{name}': value for name, value in _course_counts().items()})
+
+
+def stale_counters():
+    modules = counted_modules().exclude(content_count=F('actual_contents'))
+    courses = counted_courses().filter(
+        ~Q(module_count=F('actual_module_count')) |
+        ~Q(content_count=F('actual_content_count')) |
+        ~Q(review_count=F('actual_review_count')) |
+        ~Q(rating_sum=F('actual_rating_sum')) |
+        ~Q(rating=_average(F('rating_sum'), F('review_count'))))
+    return modules, courses
+
+
+def rebuild_counters():
+    modules, courses = stale_counters()
+    fixed_modules = modules.update(content_count=_count(Content.objects, 'module'))
+
+    counts = _course_counts()
+    fixed_courses = courses.update(
+        **counts, rating=_average(counts['rating_sum'], counts['review_count']))
+    return fixed_modules, fixed_courses
@@ -0,0 +1,103 @@
+import csv
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .models import CompletedContent, Enrollment, Progress, Review
+from .streaming import Echo
+
+CHUNK_SIZE = 2000
+# bytes gathered before a piece is handed to the response or the file
+FLUSH_SIZE = 64 * 1024
+FORMATS = ('csv', 'jsonl')
+
+
+class Export:
+    """
+    A table that can be dumped: its columns as (name, lookup) pairs, the
+    lookup that leads to the course and the timestamp used for date ranges.
+    """
+
+    def __init__(self, model, date_field, course_field, columns):
+        self.model = model
+        self.date_field = date_field
+        self.course_field = course_field
+        self.columns = columns
+
+    @property
+    def header(self):
+        return [name for name, _ in self.columns]
+
+    def queryset(self, course=None, since=None, until=None):
+        # rows of deleted courses waiting for the purge are left out
+        queryset = self.model.objects.filter(**{f'{self.course_field}__deleted_at__isnull': True})
+        if course is not None:
+            queryset = queryset.filter(**{self.course_field: course})
+        if since is not None:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': _day_start(since)})
+        if until is not None:
+            queryset = queryset.filter(
+                **{f'{self.date_field}__lt': _day_start(until + datetime.timedelta(days=1))})
+        return queryset.order_by('pk').values_list(*(lookup for _, lookup in self.columns))
+
+    def rows(self, **filters):
+        # a server-side cursor on PostgreSQL: rows arrive CHUNK_SIZE at a time
+        return self.queryset(**filters).iterator(chunk_size=CHUNK_SIZE)
+
+
+EXPORTS = {
+    'enrollments': Export(Enrollment, 'enrolled_at', 'course', [
+        ('id', 'id'), ('user_id', 'user_id'), ('username', 'user__username'),
+        ('course_id', 'course_id'), ('enrolled_at', 'enrolled_at'),
+    ]),
+    'progress': Export(Progress, 'updated_at', 'course', [
+        ('id', 'id'), ('user_id', 'user_id'), ('username', 'user__username'),
+        ('course_id', 'course_id'), ('status', 'status'), ('progress', 'progress'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'completions': Export(CompletedContent, 'completed_at', 'content__module__course', [
+        ('id', 'id'), ('user_id', 'user_id'), ('username', 'user__username'),
+        ('course_id', 'content__module__course_id'), ('content_id', 'content_id'),
+        ('completed_at', 'completed_at'),
+    ]),
+    'reviews': Export(Review, 'created_at', 'course', [
+        ('id', 'id'), ('user_id', 'user_id'), ('username', 'user__username'),
+        ('course_id', 'course_id'), ('rating', 'rating'), ('comment', 'comment'),
+        ('created_at', 'created_at'),
+    ]),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _csv_lines(export, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(export.header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _jsonl_lines(export, rows):
+    header = export.header
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_chunks(export, format='csv', **filters):
+    """
+    The export as UTF-8 byte strings of about FLUSH_SIZE each. Only one
+    chunk of rows is held at a time, whatever the size of the table.
+    """
+    lines = (_csv_lines if format == 'csv' else _jsonl_lines)(export, export.rows(**filters))
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
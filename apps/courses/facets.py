@@ -0,0 +1,57 @@
+from django.db.models import Count, F
+from .models import CatalogFacet, Category, Course, CourseCategory
+
+
+def adjust_facet(facet, value, label, delta):
+    if not value or not delta:
+        return
+    CatalogFacet.objects.get_or_create(
+        facet=facet, value=str(value), defaults={'label': label})
+    CatalogFacet.objects.filter(facet=facet, value=str(value)).update(
+        count=F('count') + delta)
+
+
+def adjust_category_facets(category_ids, delta):
+    for category in Category.objects.filter(id__in=category_ids):
+        adjust_facet(CatalogFacet.CATEGORY, category.pk, category.name, delta)
+
+
+def catalog_facets():
+    facets = {CatalogFacet.CATEGORY: [], CatalogFacet.LEVEL: []}
+    for facet in CatalogFacet.objects.filter(count__gt=0):
+        facets[facet.facet].append(facet)
+    return facets
+
+
+def rebuild_facets():
+    rows = [
+        CatalogFacet(facet=CatalogFacet.CATEGORY, value=str(row['category']),
+                     label=row['category__name'], count=row['total'])
+        for row in CourseCategory.objects.values('category', 'category__name')
+        .annotate(total=Count('id'))
+    ]
+    rows += [
+        CatalogFacet(facet=CatalogFacet.LEVEL, value=row['level'],
+                     label=row['level'], count=row['total'])
+        for row in Course.objects.exclude(level='').values('level')
+        .annotate(total=Count('id')).order_by()
+    ]
+
+    CatalogFacet.objects.all().delete()
+    CatalogFacet.objects.bulk_create(rows)
+    return rows
+
+
+def link_facets(query_params, facets):
+    # each facet links to the current query with that value toggled
+    for name, items in facets.items():
+        for item in items:
+            params = query_params.copy()
+            params.pop('cursor', None)
+            item.active = params.get(name) == item.value
+            if item.active:
+                params.pop(name)
+            else:
+                params[name] = item.value
+            item.query_string = params.urlencode()
+    return facets
@@ -1,32 +1,97 @@
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Max
+from django.contrib.postgres.search import SearchVectorField
+
+# room for about ten moves into the same spot before a rebalance
+SPARSE_ORDER_GAP = 1024
 
 
 class OrderField(models.PositiveIntegerField):
-    def __init__(self, for_fields=None, *args, **kwargs):
+    """
+    Position among the rows that share ``for_fields``. With ``gap`` > 1 the
+    ranks are spread out, so an item can be moved between two others by
+    updating its own row only; the scope is respread when a gap runs out.
+    """
+
+    def __init__(self, for_fields=None, gap=1, *args, **kwargs):
         self.for_fields = for_fields
+        self.gap = gap
         super().__init__(*args, **kwargs)
 
-    def pre_save(self, model_instance, add):
-        if getattr(model_instance, self.attname) is None:
-            try:
-                qs = self.model.objects.all()
+    def scope(self, model_instance):
+        qs = self.model._base_manager.all()
+        if self.for_fields:
+            qs = qs.filter(**{
+                field: getattr(model_instance, self.model._meta.get_field(field).attname)
+                for field in self.for_fields})
+        return qs
 
-                if self.for_fields:
-                    query = {
-                        field: getattr(model_instance, field)
-                        for field in self.for_fields
-                    }
+    def lock_scope(self, model_instance):
+        # concurrent inserts into the same parent queue up behind this lock;
+        # it lasts until the end of the caller's transaction
+        connection = connections[router.db_for_write(self.model, instance=model_instance)]
+        if not connection.in_atomic_block or not connection.features.has_select_for_update:
+            return
+        for name in self.for_fields or ():
+            field = self.model._meta.get_field(name)
+            if field.is_relation:
+                list(field.related_model._base_manager.select_for_update().filter(
+                    pk=getattr(model_instance, field.attname)).values_list('pk'))
 
-                    qs = qs.filter(**query)
+    def rank(self, index):
+        return (index + 1) * self.gap if self.gap > 1 else index
 
-                last_item = qs.latest(self.attname)
-                value = getattr(last_item, self.attname) + 1
-            except ObjectDoesNotExist:
-                value = 0
+    def pre_save(self, model_instance, add):
+        if getattr(model_instance, self.attname) is None:
+            self.lock_scope(model_instance)
+            last = self.scope(model_instance).aggregate(last=Max(self.attname))['last']
+            value = self.rank(0) if last is None else last + self.gap
 
             setattr(model_instance, self.attname, value)
 
             return value
         else:
             return super().pre_save(model_instance, add)
+
+    def _between(self, previous, following):
+        low = getattr(previous, self.attname) if previous is not None else None
+        high = getattr(following, self.attname) if following is not None else None
+        if high is None:
+            return self.rank(0) if low is None else low + self.gap
+        if low is None:
+            return high // 2 if high > 0 else None
+        return (low + high) // 2 if high - low >= 2 else None
+
+    def rebalance(self, model_instance):
+        rows = list(self.scope(model_instance).order_by(self.attname, 'pk'))
+        for index, row in enumerate(rows):
+            setattr(row, self.attname, self.rank(index))
+        self.model._base_manager.bulk_update(rows, [self.attname])
+
+    def move(self, model_instance, previous=None, following=None):
+        """
+        Place ``model_instance`` between its new neighbours (``None`` at
+        either end). Only its row is written unless the gap is exhausted.
+        """
+        if self.gap < 2:
+            raise ValueError("OrderField.move() needs a gap of at least 2")
+        with transaction.atomic(using=router.db_for_write(self.model, instance=model_instance)):
+            self.lock_scope(model_instance)
+            value = self._between(previous, following)
+            if value is None:
+                self.rebalance(model_instance)
+                for neighbour in (previous, following):
+                    if neighbour is not None:
+                        neighbour.refresh_from_db(fields=[self.attname])
+                value = self._between(previous, following)
+
+            self.model._base_manager.filter(pk=model_instance.pk).update(**{self.attname: value})
+            setattr(model_instance, self.attname, value)
+
+
+class SearchDocumentField(SearchVectorField):
+    # tsvector on PostgreSQL, plain text elsewhere so SQLite databases migrate
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return super().db_type(connection)
+        return 'text'
@@ -0,0 +1,31 @@
+import threading
+from django.db import connections
+
+_timers = {}
+_lock = threading.Lock()
+
+
+def run_later(delay, func):
+    """
+    Without a task queue, deferred work runs on a timer thread of this
+    process. Calls made while ``func`` is already pending are coalesced into
+    that run; a ``delay`` of None skips it, leaving the work to a management
+    command.
+    """
+    if delay is None:
+        return
+    with _lock:
+        if func in _timers:
+            return
+        timer = _timers[func] = threading.Timer(delay, _run, [func])
+        timer.daemon = True
+        timer.start()
+
+
+def _run(func):
+    with _lock:
+        _timers.pop(func, None)
+    try:
+        func()
+    finally:
+        connections.close_all()
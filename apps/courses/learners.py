@@ -0,0 +1,138 @@
+import csv
+from collections import Counter
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery
+from .models import CourseCompletion, Enrollment
+from .streaming import Echo
+
+CHUNK_SIZE = 2000
+SUMMARY_KEY = 'courses:progress-summary:{}:{}:{}:{}:{}'
+SUMMARY_TIMEOUT = 60 * 60
+PERCENTILES = (25, 50, 75, 90)
+
+
+def module_masks(outline):
+    # one int per module with the bits of its contents' slots set; counting
+    # through the bitmaps reads one row per learner instead of grouping
+    # every CompletedContent row of the course
+    return [sum(1 << content.slot for content in module.contents if content.slot is not None)
+            for module in outline.modules]
+
+
+def module_completion(bits, masks):
+    # completed lessons per module, straight from the completion bitmap
+    value = int.from_bytes(bits or b'', 'little')
+    return [(value & mask).bit_count() for mask in masks]
+
+
+def learners(course):
+    # enrolled students with their bitmap, one row each
+    bits = CourseCompletion.objects.filter(course=course, user=OuterRef('user')).values('bits')
+    return (Enrollment.objects.filter(course=course).select_related('user')
+            .annotate(bits=Subquery(bits)).order_by('user_id'))
+
+
+class ProgressSummary:
+    """
+    Distribution of a course's learners over its modules, built in one pass
+    over their bitmaps. Memory grows with the number of lessons, not of
+    learners.
+    """
+
+    def __init__(self, outline):
+        self.modules = outline.modules
+        self.totals = [module.total_count for module in outline.modules]
+        self.total = sum(self.totals)
+        self.learners = 0
+        # completed lessons -> learners
+        self.histogram = Counter()
+        self.started = [0] * len(self.modules)
+        self.finished = [0] * len(self.modules)
+        # learners whose first unfinished module is this one
+        self.stuck = [0] * len(self.modules)
+
+    def add(self, counts):
+        self.learners += 1
+        self.histogram[sum(counts)] += 1
+        first_unfinished = None
+        for i, (done, total) in enumerate(zip(counts, self.totals)):
+            if done:
+                self.started[i] += 1
+            if done >= total:
+                self.finished[i] += 1
+            elif first_unfinished is None:
+                first_unfinished = i
+        if first_unfinished is not None:
+            self.stuck[first_unfinished] += 1
+
+    def percentile(self, p):
+        # completion percent the first p% of learners (least advanced
+        # first) stay at or below
+        if not self.learners or not self.total:
+            return 0
+        rank = max(1, -(-p * self.learners // 100))
+        seen = 0
+        for completed in sorted(self.histogram):
+            seen += self.histogram[completed]
+            if seen >= rank:
+                return completed / self.total * 100
+        return 100
+
+    @property
+    def percentiles(self):
+        return [(p, self.percentile(p)) for p in PERCENTILES]
+
+    @property
+    def funnel(self):
+        return list(zip(self.modules, self.started, self.finished, self.stuck))
+
+
+def build_progress_summary(course, outline):
+    masks = module_masks(outline)
+    summary = ProgressSummary(outline)
+    rows = learners(course).values_list('bits', flat=True).iterator(chunk_size=CHUNK_SIZE)
+    for bits in rows:
+        summary.add(module_completion(bits, masks))
+    return summary
+
+
+def progress_summary(course, outline):
+    """
+    The summary of ``course``, rebuilt only when its outline, its enrollments
+    or one of its bitmaps changed; paging through the matrix reads two
+    aggregates instead of every learner's bitmap.
+    """
+    enrollments = Enrollment.objects.filter(course=course).aggregate(
+        count=Count('id'), last=Max('id'))
+    updated = CourseCompletion.objects.filter(course=course).aggregate(
+        last=Max('updated_at'))['last']
+    key = SUMMARY_KEY.format(course.pk, outline.version, enrollments['count'],
+                             enrollments['last'], updated.timestamp() if updated else 0)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_progress_summary(course, outline)
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def progress_csv_rows(course, outline):
+    """
+    Lines of the students x modules CSV. The learners are read in chunks
+    with a single streaming query, so a large course never sits in memory.
+    """
+    masks = module_masks(outline)
+    totals = [module.total_count for module in outline.modules]
+    total = sum(totals)
+    writer = csv.writer(Echo())
+
+    yield writer.writerow(
+        ['usuario', 'nombre'] + [f'{module.title} ({module.total_count})'
+                                 for module in outline.modules] + ['completadas', 'porcentaje'])
+    rows = learners(course).values_list(
+        'user__username', 'user__first_name', 'user__last_name', 'bits')
+    for username, first_name, last_name, bits in rows.iterator(chunk_size=CHUNK_SIZE):
+        counts = module_completion(bits, masks)
+        completed = sum(counts)
+        yield writer.writerow(
+            [username, f'{first_name} {last_name}'.strip()] + counts +
+            [completed, f'{completed / total * 100:.1f}' if total else '0.0'])
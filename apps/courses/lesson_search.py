@@ -0,0 +1,145 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import OuterRef, Subquery
+from django.utils.html import strip_tags
+from .models import Content, Text
+from .outline import course_outline
+from .search import normalize
+
+MAX_INDEXES = 64
+TITLE_WEIGHT = 3
+TOKEN_RE = re.compile(r'\w{2,}')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(strip_tags(text or '')))
+
+
+class LessonIndex:
+    """
+    Search index over the lessons of one course: a prefix trie over title
+    tokens and an inverted index over the Text bodies. Built for one outline
+    version and never mutated afterwards.
+    """
+    __slots__ = ('version', 'outline', 'bodies', 'trie', 'postings', 'vocabulary')
+
+    def __init__(self, outline, bodies):
+        # bodies: {content_id: (updated_at, Counter of body tokens)}
+        self.version = outline.version
+        self.outline = outline
+        self.bodies = bodies
+
+        # every trie node keeps the ids of the titles below it (None) and of
+        # the titles with a token ending there (''), so a lookup is a walk of
+        # len(term) steps
+        self.trie = {}
+        for content in outline.contents.values():
+            for token in set(tokenize(content.title)):
+                node = self.trie
+                for char in token:
+                    node = node.setdefault(char, {None: set()})
+                    node[None].add(content.id)
+                node.setdefault('', set()).add(content.id)
+
+        self.postings = {}
+        for content_id, (_, tokens) in bodies.items():
+            for token, count in tokens.items():
+                self.postings.setdefault(token, {})[content_id] = count
+        self.vocabulary = sorted(self.postings)
+
+    def _title_matches(self, term, prefix):
+        node = self.trie
+        for char in term:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node[None] if prefix else node.get('', set())
+
+    def _body_matches(self, term, prefix):
+        if not prefix:
+            return self.postings.get(term, {})
+        # the sorted vocabulary turns a prefix into a contiguous range
+        matches = {}
+        position = bisect_left(self.vocabulary, term)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(term):
+            for content_id, count in self.postings[self.vocabulary[position]].items():
+                matches[content_id] = matches.get(content_id, 0) + count
+            position += 1
+        return matches
+
+    def search(self, query, limit=10):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores = None
+        for i, term in enumerate(terms):
+            # the last term is still being typed
+            prefix = i == len(terms) - 1
+            term_scores = {
+                content_id: min(count, 5)
+                for content_id, count in self._body_matches(term, prefix).items()
+            }
+            for content_id in self._title_matches(term, prefix):
+                term_scores[content_id] = term_scores.get(content_id, 0) + TITLE_WEIGHT
+
+            # every term has to match somewhere
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {content_id: score + term_scores[content_id]
+                          for content_id, score in scores.items() if content_id in term_scores}
+            if not scores:
+                return []
+
+        order = {content_id: i for i, content_id in enumerate(self.outline.contents)}
+        ranked = sorted(scores, key=lambda content_id: (-scores[content_id], order[content_id]))
+        return [self.outline.contents[content_id] for content_id in ranked[:limit]]
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _text_bodies(course, previous):
+    # only the Text items changed since the previous index are read and
+    # tokenized again
+    text_type = ContentType.objects.get_for_model(Text)
+    rows = (Content.objects.filter(module__course=course, content_type=text_type)
+            .annotate(updated_at=Subquery(
+                Text.objects.filter(pk=OuterRef('object_id')).values('updated_at')))
+            .values_list('id', 'object_id', 'updated_at'))
+
+    bodies, changed = {}, {}
+    for content_id, text_id, updated_at in rows:
+        known = previous.get(content_id)
+        if known and known[0] == updated_at:
+            bodies[content_id] = known
+        else:
+            changed[content_id] = (text_id, updated_at)
+
+    texts = dict(Text.objects.filter(pk__in=[text_id for text_id, _ in changed.values()])
+                 .values_list('id', 'content'))
+    for content_id, (text_id, updated_at) in changed.items():
+        bodies[content_id] = (updated_at, Counter(tokenize(texts.get(text_id))))
+    return bodies
+
+
+def lesson_index(course):
+    outline = course_outline(course)
+    with _lock:
+        index = _indexes.get(course.pk)
+        if index is not None:
+            _indexes.move_to_end(course.pk)
+    if index is not None and index.version == outline.version:
+        return index
+
+    index = LessonIndex(outline, _text_bodies(course, index.bodies if index else {}))
+    with _lock:
+        _indexes[course.pk] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,38 @@
+import datetime
+import gzip
+import sys
+from django.core.management.base import BaseCommand
+from ...exports import EXPORTS, FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = "Stream enrollments, progress, completions or reviews as CSV or JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--course', type=int, help="Only this course id")
+        parser.add_argument('--since', type=datetime.date.fromisoformat,
+                            help="First day to include (YYYY-MM-DD)")
+        parser.add_argument('--until', type=datetime.date.fromisoformat,
+                            help="Last day to include (YYYY-MM-DD)")
+        parser.add_argument('--output', '-o', help="File to write instead of stdout")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output")
+
+    def handle(self, *args, **options):
+        chunks = export_chunks(
+            EXPORTS[options['name']], options['format'], course=options['course'],
+            since=options['since'], until=options['until'])
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            target = gzip.GzipFile(fileobj=output, mode='wb') if options['gzip'] else output
+            for chunk in chunks:
+                target.write(chunk)
+            if target is not output:
+                target.close()
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from ...packages import PackageError, import_package
+
+
+class Command(BaseCommand):
+    help = "Create a course from a ZIP package (course.json plus the files it references)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('package', help="Path to the ZIP package")
+        parser.add_argument('--owner', required=True, help="Username of the instructor")
+
+    def handle(self, *args, **options):
+        try:
+            owner = get_user_model().objects.get(username=options['owner'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['owner']}")
+
+        try:
+            with open(options['package'], 'rb') as package:
+                result = import_package(package, owner)
+        except (OSError, PackageError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(f"{error['where']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Curso {result.course.pk} creado con {result.course.content_count} contenidos"
+            f" ({len(result.errors)} errores)"))
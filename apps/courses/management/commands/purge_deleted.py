@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from ...purge import PURGE_BATCH_SIZE, collect_orphaned_files, purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Delete the courses, modules and contents marked as deleted, and the items nothing uses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+        parser.add_argument('--files', action='store_true',
+                            help="Also delete stored files no File or Image refers to")
+
+    def handle(self, *args, **options):
+        deleted = purge_deleted(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} filas eliminadas"))
+        if options['files']:
+            files = collect_orphaned_files()
+            self.stdout.write(self.style.SUCCESS(f"{files} archivos eliminados"))
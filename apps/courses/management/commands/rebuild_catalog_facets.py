@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ...facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the catalog facet counts from scratch"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_facets()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(rows)} facetas recalculadas"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from ...completion import assign_missing_slots, import_completed_rows
+
+
+class Command(BaseCommand):
+    help = "Assign missing content slots and merge CompletedContent rows into the completion bitmaps"
+
+    def handle(self, *args, **options):
+        contents = assign_missing_slots()
+        completions = import_completed_rows()
+        self.stdout.write(self.style.SUCCESS(
+            f"{contents} contenidos numerados, {completions} progresos actualizados"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from ...counters import rebuild_counters, stale_counters
+
+
+class Command(BaseCommand):
+    help = "Verify and rebuild the structure and review counters on Course and Module"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report stale counters, exit with an error if any")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            modules, courses = stale_counters()
+            for module in modules:
+                self.stdout.write(
+                    f"Módulo {module.pk}: {module.content_count} != {module.actual_contents}")
+            for course in courses:
+                self.stdout.write(
+                    f"Curso {course.pk}: módulos {course.module_count}/{course.actual_module_count}, "
+                    f"contenidos {course.content_count}/{course.actual_content_count}, "
+                    f"reseñas {course.review_count}/{course.actual_review_count}, "
+                    f"suma {course.rating_sum}/{course.actual_rating_sum}")
+            if modules or courses:
+                raise CommandError("Hay contadores desactualizados")
+            self.stdout.write(self.style.SUCCESS("Contadores correctos"))
+            return
+
+        with transaction.atomic():
+            fixed_modules, fixed_courses = rebuild_counters()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{fixed_modules} módulos y {fixed_courses} cursos corregidos"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from ...models import Course
+from ...search import index_courses
+
+
+class Command(BaseCommand):
+    help = "Rebuild the course search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        course_ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+
+        for start in range(0, len(course_ids), batch_size):
+            index_courses(course_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(course_ids)} cursos indexados"))
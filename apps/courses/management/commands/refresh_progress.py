@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from ...models import Course
+from ...progress import refresh_course_progress, refresh_stale_progress
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored progress of the students of courses whose structure changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute every course, not only the stale ones")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            course_ids = list(Course.objects.values_list('pk', flat=True))
+            for course_id in course_ids:
+                refresh_course_progress(course_id)
+            refreshed = len(course_ids)
+        else:
+            refreshed = refresh_stale_progress()
+
+        self.stdout.write(self.style.SUCCESS(f"{refreshed} cursos actualizados"))
@@ -0,0 +1,15 @@
+import datetime
+from django.core.management.base import BaseCommand
+from ...analytics import rollup_engagement
+
+
+class Command(BaseCommand):
+    help = "Bring the daily engagement rollups up to date (run it daily, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=datetime.date.fromisoformat,
+                            help="Recompute from this day (YYYY-MM-DD) to backfill")
+
+    def handle(self, *args, **options):
+        days = rollup_engagement(options['since'])
+        self.stdout.write(self.style.SUCCESS(f"{days} días agregados"))
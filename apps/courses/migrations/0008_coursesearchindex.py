@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:38
+
+import apps.courses.fields
+import django.db.models.deletion
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX courses_search_vector_gin ON courses_coursesearchindex '
+        'USING gin (search_vector)')
+    schema_editor.execute(
+        'CREATE INDEX courses_search_document_trgm ON courses_coursesearchindex '
+        'USING gin (document gin_trgm_ops)')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS courses_search_vector_gin')
+    schema_editor.execute('DROP INDEX IF EXISTS courses_search_document_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_alter_content_options'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='CourseSearchIndex',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='courses.course')),
+                ('title', models.TextField(blank=True)),
+                ('document', models.TextField(blank=True)),
+                ('search_vector', apps.courses.fields.SearchDocumentField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_coursesearchindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('category', 'Categoría'), ('level', 'Nivel')], max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('label', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['facet', 'label'],
+                'unique_together': {('facet', 'value')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_existing(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Content = apps.get_model('courses', 'Content')
+
+    def count(queryset, field):
+        return Coalesce(Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('id')).values('total')), Value(0))
+
+    Module.objects.update(content_count=count(Content.objects, 'module'))
+    Course.objects.update(module_count=count(Module.objects, 'course'),
+                          content_count=count(Content.objects, 'module__course'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_catalogfacet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='content_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='module_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='content_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
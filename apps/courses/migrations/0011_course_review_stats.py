@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:47
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def count_existing_reviews(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Review = apps.get_model('courses', 'Review')
+
+    def aggregate(expression):
+        return Coalesce(Subquery(
+            Review.objects.filter(course=OuterRef('pk')).order_by()
+            .values('course').annotate(total=expression).values('total')), Value(0))
+
+    count, total = aggregate(Count('id')), aggregate(Sum('rating'))
+    Course.objects.update(
+        review_count=count, rating_sum=total,
+        rating=Coalesce(Cast(total, FloatField()) / NullIf(count, 0), Value(0.0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_course_module_content_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_reviews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:51
+
+import apps.courses.models.course
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_review_course_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='outline_version',
+            field=models.BigIntegerField(default=apps.courses.models.course.new_outline_version, editable=False),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:56
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def build_completions(apps, schema_editor):
+    Content = apps.get_model('courses', 'Content')
+    Course = apps.get_model('courses', 'Course')
+    CompletedContent = apps.get_model('courses', 'CompletedContent')
+    CourseCompletion = apps.get_model('courses', 'CourseCompletion')
+
+    # number the contents of every course in lesson order
+    slots = {}
+    by_course = defaultdict(list)
+    for content_id, course_id in (Content.objects
+                                  .order_by('module__course', 'module__order', 'order', 'id')
+                                  .values_list('id', 'module__course_id')):
+        slots[content_id] = len(by_course[course_id])
+        by_course[course_id].append(Content(id=content_id, slot=slots[content_id]))
+    for course_id, contents in by_course.items():
+        Content.objects.bulk_update(contents, ['slot'], batch_size=500)
+        Course.objects.filter(pk=course_id).update(content_slots=len(contents))
+
+    bits = defaultdict(int)
+    for user_id, course_id, content_id in CompletedContent.objects.values_list(
+            'user_id', 'content__module__course_id', 'content_id').iterator(chunk_size=2000):
+        bits[user_id, course_id] |= 1 << slots[content_id]
+    CourseCompletion.objects.bulk_create([
+        CourseCompletion(user_id=user_id, course_id=course_id,
+                         bits=value.to_bytes((value.bit_length() + 7) // 8, 'little'),
+                         completed_count=value.bit_count())
+        for (user_id, course_id), value in bits.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_course_outline_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='slot',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='content_slots',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='CourseCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bits', models.BinaryField(default=b'')),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='courses.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.RunPython(build_completions, migrations.RunPython.noop),
+    ]
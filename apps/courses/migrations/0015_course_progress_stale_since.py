@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_course_completion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='progress_stale_since',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_course_progress_stale_since'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='deleted_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='deleted_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='deleted_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
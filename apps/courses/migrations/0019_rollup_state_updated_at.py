@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_engagement_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupstate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -6,4 +6,7 @@ from .enrollment import Enrollment
 from .progress import Progress
 from .review import Review
 from .content import Content, Text, Video, File, Image
-from .progress_tracking import CompletedContent
+from .progress_tracking import CompletedContent, CourseCompletion
+from .search import CourseSearchIndex
+from .facet import CatalogFacet
+from .analytics import CourseDailyStats, RollupState
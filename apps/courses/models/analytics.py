@@ -0,0 +1,36 @@
+from django.db import models
+from .course import Course
+
+
+class CourseDailyStats(models.Model):
+    # engagement of one course on one day, written by rollup_engagement()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    enrollments = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+    # distinct students who completed a lesson that day
+    active_learners = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+    # rating histogram of the day's reviews
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course', 'day')
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.course} - {self.day}"
+
+
+class RollupState(models.Model):
+    # high-water mark of a rollup: every day before ``day`` is final
+    name = models.CharField(max_length=50, unique=True)
+    day = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.day}"
@@ -3,8 +3,10 @@ from .module import Module
 from django.db import models
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 from django.conf import settings
-from ..fields import OrderField
+from ..fields import SPARSE_ORDER_GAP, OrderField
+from .mixins import LiveManager, OrderedMixin
 
 
 class ItemBase(models.Model):
@@ -37,7 +39,22 @@ class Video(ItemBase):
     url = models.URLField()
 
 
-class Content(models.Model):
+ITEM_MODELS = (Text, File, Image, Video)
+
+
+class ContentQuerySet(models.QuerySet):
+    def with_items(self, *fields):
+        # resolves Content.item with one query per item model; pass the item
+        # fields to load, e.g. with_items('title') for outlines
+        querysets = [
+            model.objects.only('id', *fields) if fields else model.objects.all()
+            for model in ITEM_MODELS
+        ]
+        return (self.select_related('content_type')
+                .prefetch_related(GenericPrefetch('item', querysets)))
+
+
+class Content(OrderedMixin, models.Model):
     module = models.ForeignKey(
         Module, related_name='contents', on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, limit_choices_to={
@@ -45,7 +62,14 @@ class Content(models.Model):
     })
     object_id = models.PositiveIntegerField()
     item = GenericForeignKey('content_type', 'object_id')
-    order = OrderField(blank=True, for_fields=['module'])
+    order = OrderField(blank=True, for_fields=['module'], gap=SPARSE_ORDER_GAP)
+    # stable position within the course, the bit used in CourseCompletion;
+    # unlike order it survives reordering
+    slot = models.PositiveIntegerField(null=True, editable=False)
+    deleted_at = models.DateTimeField(null=True, editable=False)
+
+    objects = LiveManager.from_queryset(ContentQuerySet)()
+    all_objects = models.Manager.from_queryset(ContentQuerySet)()
 
     class Meta:
         ordering = ['order']
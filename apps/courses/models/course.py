@@ -1,9 +1,59 @@
+import secrets
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from .category import Category
+from .mixins import CounterFieldsMixin, LiveManager
 
 
-class Course(models.Model):
+class CourseQuerySet(models.QuerySet):
+    def for_catalog(self):
+        # everything a catalog card renders, in one query
+        return (self.select_related('owner__instructor_profile')
+                .only('id', 'slug', 'title', 'image', 'level', 'rating', 'created_at',
+                      'owner__first_name', 'owner__last_name',
+                      'owner__instructor_profile__photo'))
+
+    def _enrollments(self, user):
+        from .enrollment import Enrollment
+        # served by the (user, course) unique index
+        return Enrollment.objects.filter(user=user, course=models.OuterRef('pk'))
+
+    def enrolled_by(self, user):
+        return self.filter(models.Exists(self._enrollments(user)))
+
+    def not_enrolled_by(self, user):
+        return self.filter(~models.Exists(self._enrollments(user)))
+
+    def with_stats(self, active_since):
+        # per-course subqueries rather than joins, so the counts do not
+        # multiply each other; module, lesson and rating figures are the
+        # denormalized counters
+        from .enrollment import Enrollment
+        from .progress_tracking import CompletedContent
+
+        def count(queryset, course, aggregate=models.Count('*')):
+            return Coalesce(models.Subquery(
+                queryset.filter(**{course: models.OuterRef('pk')}).order_by()
+                .values(course).annotate(total=aggregate).values('total')),
+                models.Value(0))
+
+        return self.annotate(
+            enrollment_count=count(Enrollment.objects, 'course'),
+            # a student is active while completing lessons; the completion
+            # timestamps, unlike CourseCompletion.updated_at, are not touched
+            # when an instructor removes or moves contents
+            active_count=count(CompletedContent.objects.filter(completed_at__gte=active_since),
+                               'content__module__course', models.Count('user', distinct=True)))
+
+
+def new_outline_version():
+    # random rather than incremented: a version bumped in a transaction that
+    # rolls back must never be reused for a different outline
+    return secrets.randbits(62)
+
+
+class Course(CounterFieldsMixin, models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='owned_courses')
     title = models.CharField(max_length=200)
@@ -16,6 +66,24 @@ class Course(models.Model):
     level = models.CharField(max_length=50)
     rating = models.FloatField(default=0.0)
     duration = models.FloatField(default=0.0)
+    module_count = models.PositiveIntegerField(default=0, editable=False)
+    content_count = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    outline_version = models.BigIntegerField(default=new_outline_version, editable=False)
+    # next Content.slot to hand out; slots are never reused
+    content_slots = models.PositiveIntegerField(default=0, editable=False)
+    # set by structure changes until refresh_stale_progress() catches up
+    progress_stale_since = models.DateTimeField(null=True, editable=False)
+    # hidden at once, removed later by purge_deleted()
+    deleted_at = models.DateTimeField(null=True, editable=False)
+
+    counter_fields = ('module_count', 'content_count', 'review_count', 'rating_sum',
+                      'rating', 'outline_version', 'content_slots', 'progress_stale_since',
+                      'deleted_at')
+
+    objects = LiveManager.from_queryset(CourseQuerySet)()
+    all_objects = models.Manager.from_queryset(CourseQuerySet)()
 
     class Meta:
         ordering = ['-created_at']
@@ -11,6 +11,8 @@ class Enrollment(models.Model):
 
     class Meta:
         unique_together = ('user', 'course')
+        # day ranges read by the engagement rollup
+        indexes = [models.Index(fields=['enrolled_at'])]
 
     def __str__(self):
         return f"{self.user.username} inscrito en {self.course.title}"
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class CatalogFacet(models.Model):
+    CATEGORY = 'category'
+    LEVEL = 'level'
+    FACET_CHOICES = [
+        (CATEGORY, 'Categoría'),
+        (LEVEL, 'Nivel'),
+    ]
+
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    # category id or level name, the value used by the catalog filter
+    value = models.CharField(max_length=100)
+    label = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('facet', 'value')
+        ordering = ['facet', 'label']
+
+    def __str__(self):
+        return f"{self.get_facet_display()}: {self.label} ({self.count})"
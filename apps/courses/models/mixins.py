@@ -0,0 +1,30 @@
+from django.db import models, router, transaction
+
+
+class CounterFieldsMixin:
+    # columns maintained with F() updates; a plain save() of a stale instance
+    # must not write them back
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class OrderedMixin:
+    # OrderField locks the parent row while it picks the next rank; the
+    # lock only helps if the insert runs in the same transaction
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class LiveManager(models.Manager):
+    # soft-deleted rows stay hidden until the purge removes them
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
@@ -1,16 +1,24 @@
 
 from django.db import models
 from .course import Course
-from ..fields import OrderField
+from ..fields import SPARSE_ORDER_GAP, OrderField
+from .mixins import CounterFieldsMixin, LiveManager, OrderedMixin
 
 
-class Module(models.Model):
+class Module(CounterFieldsMixin, OrderedMixin, models.Model):
     course = models.ForeignKey(
         Course, on_delete=models.CASCADE, related_name='modules')
 
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    order = OrderField(blank=True, for_fields=['course'])
+    order = OrderField(blank=True, for_fields=['course'], gap=SPARSE_ORDER_GAP)
+    content_count = models.PositiveIntegerField(default=0, editable=False)
+    deleted_at = models.DateTimeField(null=True, editable=False)
+
+    counter_fields = ('content_count', 'deleted_at')
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
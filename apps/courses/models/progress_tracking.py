@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from .content import Content
+from .course import Course
 
 
 class CompletedContent(models.Model):
@@ -12,3 +13,52 @@ class CompletedContent(models.Model):
 
     class Meta:
         unique_together = ('user', 'content')
+        indexes = [models.Index(fields=['completed_at'])]
+
+
+class CourseCompletion(models.Model):
+    # completed contents of a user in a course as a bitmap over Content.slot
+    # (bit n of the little-endian bytes is slot n)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    bits = models.BinaryField(default=b'')
+    completed_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'course')
+
+    def __str__(self):
+        return f"{self.user} - {self.course}: {self.completed_count}"
+
+    def has(self, slot):
+        if slot is None:
+            return False
+        byte, bit = divmod(slot, 8)
+        return byte < len(self.bits) and bool(self.bits[byte] >> bit & 1)
+
+    def add(self, slot):
+        if self.has(slot):
+            return False
+        byte, bit = divmod(slot, 8)
+        bits = bytearray(self.bits)
+        bits.extend(bytes(max(0, byte + 1 - len(bits))))
+        bits[byte] |= 1 << bit
+        self.bits = bytes(bits)
+        self.completed_count += 1
+        return True
+
+    def discard(self, slot):
+        if not self.has(slot):
+            return False
+        byte, bit = divmod(slot, 8)
+        bits = bytearray(self.bits)
+        bits[byte] &= ~(1 << bit)
+        self.bits = bytes(bits.rstrip(b'\0'))
+        self.completed_count -= 1
+        return True
+
+    def percent(self, total):
+        # O(1): the count is kept next to the bits
+        return min(self.completed_count / total * 100, 100) if total else 0
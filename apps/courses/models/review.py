@@ -14,6 +14,11 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('user', 'course')
+        indexes = [
+            models.Index(fields=['course', 'created_at', 'id'],
+                         name='courses_review_course_recent'),
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.course.title}: {self.rating}"
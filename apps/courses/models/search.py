@@ -0,0 +1,17 @@
+from django.db import models
+from .course import Course
+from ..fields import SearchDocumentField
+
+
+class CourseSearchIndex(models.Model):
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, primary_key=True, related_name='search_index')
+    # lowercased, accent-free text: trigram source on PostgreSQL and the
+    # portable fallback everywhere else
+    title = models.TextField(blank=True)
+    document = models.TextField(blank=True)
+    search_vector = SearchDocumentField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Índice de {self.course_id}"
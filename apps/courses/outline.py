@@ -0,0 +1,108 @@
+from functools import lru_cache
+from django.core.cache import cache
+from .models import Content, Course, Module
+from .models.course import new_outline_version
+
+OUTLINE_KEY = 'courses:outline:{}:{}'
+OUTLINE_TIMEOUT = 60 * 60 * 24
+
+
+class OutlineContent:
+    __slots__ = ('id', 'title', 'kind', 'module_id', 'slot', 'previous_id', 'next_id')
+
+    def __init__(self, id, title, kind, module_id, slot, previous_id, next_id):
+        self.id = id
+        self.title = title
+        self.kind = kind
+        self.module_id = module_id
+        self.slot = slot
+        self.previous_id = previous_id
+        self.next_id = next_id
+
+
+class OutlineModule:
+    __slots__ = ('id', 'title', 'contents')
+
+    def __init__(self, id, title, contents):
+        self.id = id
+        self.title = title
+        self.contents = contents
+
+    @property
+    def total_count(self):
+        return len(self.contents)
+
+
+class CourseOutline:
+    """
+    Modules and contents of a course in lesson order, with the previous/next
+    content resolved across module boundaries. Instances are shared between
+    requests, so they are built once and never mutated.
+    """
+    __slots__ = ('course_id', 'version', 'modules', 'contents')
+
+    def __init__(self, course_id, version, modules):
+        self.course_id = course_id
+        self.version = version
+        self.modules = modules
+        self.contents = {
+            content.id: content for module in modules for content in module.contents}
+
+    def __contains__(self, content_id):
+        return content_id in self.contents
+
+    def first_content_id(self):
+        for module in self.modules:
+            if module.contents:
+                return module.contents[0].id
+        return None
+
+    def next_content_id(self, content_id):
+        content = self.contents.get(content_id)
+        return content.next_id if content else None
+
+
+def build_outline(course_id, version):
+    modules = Module.objects.filter(course_id=course_id).order_by(
+        'order', 'id').values_list('id', 'title')
+    contents = (Content.objects.filter(module__course_id=course_id)
+                .order_by('module__order', 'module_id', 'order', 'id')
+                .with_items('title'))
+
+    rows = [(content.id, content.item.title if content.item else '',
+             content.content_type.model, content.module_id, content.slot)
+            for content in contents]
+
+    by_module = {module_id: [] for module_id, _ in modules}
+    for i, (content_id, title, kind, module_id, slot) in enumerate(rows):
+        by_module[module_id].append(OutlineContent(
+            content_id, title, kind, module_id, slot,
+            rows[i - 1][0] if i > 0 else None,
+            rows[i + 1][0] if i + 1 < len(rows) else None))
+
+    return CourseOutline(course_id, version, tuple(
+        OutlineModule(module_id, title, tuple(by_module[module_id]))
+        for module_id, title in modules))
+
+
+@lru_cache(maxsize=256)
+def _outline(course_id, version):
+    # keyed by version, so a bump makes every process miss both this and the
+    # shared cache; superseded outlines simply age out
+    key = OUTLINE_KEY.format(course_id, version)
+    outline = cache.get(key)
+    if outline is None:
+        outline = build_outline(course_id, version)
+        cache.set(key, outline, OUTLINE_TIMEOUT)
+    return outline
+
+
+def course_outline(course):
+    return _outline(course.pk, course.outline_version)
+
+
+def bump_outline_version(**lookups):
+    # e.g. bump_outline_version(pk=course_id) or (modules=module_id)
+    version = new_outline_version()
+    Course.objects.filter(**lookups).update(outline_version=version)
+    return version
@@ -0,0 +1,185 @@
+import json
+import posixpath
+import zipfile
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File as StoredFile
+from django.db import transaction
+from .fields import SPARSE_ORDER_GAP
+from .models import Category, Content, Course, File, Image, Module, Text, Video
+from .outline import bump_outline_version
+
+MANIFEST_NAME = 'course.json'
+# per attached file, checked against the size declared in the ZIP directory
+MAX_FILE_SIZE = getattr(settings, 'COURSE_PACKAGE_MAX_FILE_SIZE', 100 * 1024 * 1024)
+
+ITEM_TYPES = {
+    'text': (Text, 'content'),
+    'video': (Video, 'url'),
+    'file': (File, 'file'),
+    'image': (Image, 'file'),
+}
+COURSE_FIELDS = ('title', 'slug', 'overview', 'image', 'level', 'duration')
+
+
+class PackageError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self, course=None, errors=None):
+        self.course = course
+        self.errors = errors or []
+
+    def error(self, where, message):
+        self.errors.append({'where': where, 'error': message})
+
+
+def _messages(error):
+    return '; '.join(f'{field}: {" ".join(messages)}'
+                     for field, messages in error.message_dict.items())
+
+
+def _build_items(package, manifest, owner, result):
+    """
+    Validates every module and content of the manifest. Returns
+    [(module, [(content_type, item, attachment)])], skipping (and reporting)
+    the contents that are not valid.
+    """
+    members = {info.filename: info for info in package.infolist()}
+    modules = []
+    for m, data in enumerate(manifest.get('modules') or []):
+        where = f'módulo {m + 1}'
+        module = Module(title=data.get('title', ''), description=data.get('description', ''))
+        try:
+            module.full_clean(exclude=['course', 'order'])
+        except ValidationError as e:
+            result.error(where, _messages(e))
+            continue
+
+        contents = []
+        for c, item_data in enumerate(data.get('contents') or []):
+            item_where = f'{where}, contenido {c + 1}'
+            kind = item_data.get('type')
+            if kind not in ITEM_TYPES:
+                result.error(item_where, f'tipo desconocido: {kind!r}')
+                continue
+            model, field = ITEM_TYPES[kind]
+
+            attachment = None
+            if field == 'file':
+                path = posixpath.normpath(item_data.get('path') or '')
+                info = members.get(path)
+                if info is None or info.is_dir():
+                    result.error(item_where, f'falta el archivo {path!r} en el paquete')
+                    continue
+                if info.file_size > MAX_FILE_SIZE:
+                    result.error(item_where, f'{path!r} supera el tamaño máximo')
+                    continue
+                attachment = info
+                item = model(owner=owner, title=item_data.get('title', ''))
+            else:
+                item = model(owner=owner, title=item_data.get('title', ''),
+                             **{field: item_data.get(field, '')})
+
+            try:
+                item.full_clean(exclude=['owner', 'file'])
+            except ValidationError as e:
+                result.error(item_where, _messages(e))
+                continue
+            contents.append((kind, item, attachment))
+        modules.append((module, contents))
+    return modules
+
+
+def _store_attachments(package, modules, stored):
+    # streamed member by member: storage.save() copies in chunks, so an
+    # attachment is never held in memory as a whole
+    for _, contents in modules:
+        for _, item, attachment in contents:
+            if attachment is None:
+                continue
+            field = item._meta.get_field('file')
+            with package.open(attachment) as source:
+                name = field.generate_filename(item, posixpath.basename(attachment.filename))
+                item.file.name = field.storage.save(name, StoredFile(source, name=name))
+                stored.append((field.storage, item.file.name))
+
+
+def _create(course, categories, modules):
+    course.module_count = len(modules)
+    course.content_count = course.content_slots = sum(len(c) for _, c in modules)
+    course.save()
+    if categories:
+        course.categories.add(*categories)
+
+    for index, (module, contents) in enumerate(modules):
+        module.course = course
+        module.order = (index + 1) * SPARSE_ORDER_GAP
+        module.content_count = len(contents)
+    Module.objects.bulk_create([module for module, _ in modules])
+
+    # one INSERT per item model, then one for all the Content rows
+    for kind, (model, _) in ITEM_TYPES.items():
+        model.objects.bulk_create(
+            [item for _, contents in modules for item_kind, item, _ in contents
+             if item_kind == kind], batch_size=500)
+
+    slot = 0
+    rows = []
+    for module, contents in modules:
+        for index, (_, item, _) in enumerate(contents):
+            rows.append(Content(module=module, item=item, slot=slot,
+                                order=(index + 1) * SPARSE_ORDER_GAP))
+            slot += 1
+    Content.objects.bulk_create(rows, batch_size=500)
+    # bulk_create sends no signals
+    bump_outline_version(pk=course.pk)
+
+
+def import_package(source, owner):
+    """
+    Creates a course from a ZIP package: a course.json manifest plus the
+    files it references. Invalid modules or contents are skipped and listed
+    in the result; problems with the course itself raise PackageError.
+    """
+    result = ImportResult()
+    try:
+        package = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise PackageError('El paquete no es un ZIP válido')
+
+    with package:
+        try:
+            manifest = json.loads(package.read(MANIFEST_NAME))
+        except KeyError:
+            raise PackageError(f'Falta {MANIFEST_NAME} en el paquete')
+        except ValueError as e:
+            raise PackageError(f'{MANIFEST_NAME} no es JSON válido: {e}')
+
+        course = Course(owner=owner, **{
+            field: manifest[field] for field in COURSE_FIELDS if field in manifest})
+        try:
+            course.full_clean()
+        except ValidationError as e:
+            raise PackageError(_messages(e))
+
+        names = manifest.get('categories') or []
+        categories = list(Category.objects.filter(name__in=names))
+        for name in set(names) - {category.name for category in categories}:
+            result.error('curso', f'categoría desconocida: {name!r}')
+
+        modules = _build_items(package, manifest, owner, result)
+
+        stored = []
+        try:
+            _store_attachments(package, modules, stored)
+            with transaction.atomic():
+                _create(course, categories, modules)
+        except Exception:
+            for storage, name in stored:
+                storage.delete(name)
+            raise
+
+    result.course = course
+    return result
@@ -0,0 +1,154 @@
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+FIRST, NEXT, PREVIOUS, LAST = 'first', 'next', 'prev', 'last'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates datetimes to milliseconds, which would make
+    # the seek skip rows that differ only in microseconds
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def approximate_count(queryset):
+    # row estimate from the PostgreSQL planner instead of an exact COUNT(*)
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan['Plan']['Plan Rows'])
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def last_cursor(self):
+        return self.paginator.encode(LAST)
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over the queryset ordering (plus the primary key as a
+    tiebreaker). Pages are addressed by opaque cursors instead of numbers, so
+    no COUNT(*) or OFFSET is issued.
+    """
+
+    def __init__(self, queryset, per_page, with_count=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.with_count = with_count
+
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('-id')
+        self.ordering = ordering
+
+    @property
+    def count(self):
+        if not self.with_count:
+            return None
+        if not hasattr(self, '_count'):
+            self._count = approximate_count(self.queryset)
+        return self._count
+
+    def encode(self, direction, values=None):
+        payload = json.dumps([direction, values], cls=CursorEncoder)
+        return urlsafe_base64_encode(payload.encode())
+
+    def decode(self, cursor):
+        try:
+            direction, values = json.loads(urlsafe_base64_decode(cursor))
+        except (TypeError, ValueError):
+            return FIRST, None
+
+        if direction in (NEXT, PREVIOUS) and (
+                not isinstance(values, list) or len(values) != len(self.ordering)):
+            return FIRST, None
+        if direction not in (NEXT, PREVIOUS, LAST):
+            return FIRST, None
+        return direction, values
+
+    def _values(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def _seek(self, values, backwards):
+        # (a, b, c) after (x, y, z) == a > x OR (a = x AND b > y) OR ...
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != backwards else 'gt'
+            prefix = {self.ordering[j].lstrip('-'): values[j] for j in range(i)}
+            condition |= Q(**prefix, **{f'{name}__{lookup}': values[i]})
+        return condition
+
+    def page(self, cursor=None):
+        direction, values = self.decode(cursor) if cursor else (FIRST, None)
+        backwards = direction in (PREVIOUS, LAST)
+
+        ordering = self.ordering
+        if backwards:
+            ordering = [f[1:] if f.startswith('-') else f'-{f}' for f in ordering]
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            object_list.reverse()
+
+        if not object_list:
+            return CursorPage(object_list, self)
+
+        # walking backwards, "more" means more rows before this page
+        has_next = direction == PREVIOUS or (not backwards and has_more)
+        has_previous = (backwards and has_more) or direction == NEXT
+
+        return CursorPage(
+            object_list, self,
+            next_cursor=self.encode(NEXT, self._values(object_list[-1])) if has_next else None,
+            previous_cursor=self.encode(
+                PREVIOUS, self._values(object_list[0])) if has_previous else None,
+        )
+
+
+class CursorPaginationMixin:
+    cursor_kwarg = 'cursor'
+    paginate_with_count = False
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(
+            queryset, page_size, with_count=self.paginate_with_count)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,128 @@
+import math
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from .completion import completion_for
+from .jobs import run_later
+from .models import Course, CourseCompletion, Enrollment, Progress
+from .outline import course_outline
+
+REFRESH_CHUNK_SIZE = 1000
+
+
+class CourseProgress:
+    __slots__ = ('completed_ids', 'modules', 'completed', 'total')
+
+    def __init__(self, rows):
+        # rows: (content_id, module_id, completed) for every content of the course
+        completed_ids = set()
+        modules = {}
+        for content_id, module_id, completed in rows:
+            done, total = modules.get(module_id, (0, 0))
+            modules[module_id] = (done + completed, total + 1)
+            if completed:
+                completed_ids.add(content_id)
+
+        self.completed_ids = frozenset(completed_ids)
+        self.modules = modules
+        self.completed = len(completed_ids)
+        self.total = sum(total for _, total in modules.values())
+
+    @property
+    def percent(self):
+        return self.completed / self.total * 100 if self.total else 0
+
+    def for_module(self, module_id):
+        return self.modules.get(module_id, (0, 0))
+
+
+def course_progress(user, course):
+    # one query for the user's completion bitmap; the contents and their
+    # slots come from the cached outline
+    completion = completion_for(user, course)
+    rows = ((content.id, content.module_id, completion is not None and completion.has(content.slot))
+            for content in course_outline(course).contents.values())
+    return CourseProgress(rows)
+
+
+def save_progress(user, course, percent):
+    # write only when the value moved, so most lesson views stay read-only
+    stored = Progress.objects.filter(user=user, course=course).values_list(
+        'progress', flat=True).first()
+
+    if stored is None:
+        Progress.objects.get_or_create(
+            user=user, course=course, defaults={'progress': percent})
+    elif not math.isclose(stored, percent):
+        Progress.objects.filter(user=user, course=course).update(
+            progress=percent, updated_at=timezone.now())
+
+
+def mark_progress_stale(**lookups):
+    # a burst of edits keeps the first timestamp and leads to a single run
+    Course.objects.filter(progress_stale_since__isnull=True, **lookups).update(
+        progress_stale_since=timezone.now())
+    transaction.on_commit(schedule_progress_refresh)
+
+
+def refresh_course_progress(course_id, chunk_size=REFRESH_CHUNK_SIZE):
+    total = Course.objects.filter(pk=course_id).values_list('content_count', flat=True).first()
+    if total is None:
+        return
+
+    completed = Coalesce(Subquery(
+        CourseCompletion.objects.filter(user=OuterRef('user'), course_id=course_id)
+        .values('completed_count')), 0)
+    percent = Cast(completed, FloatField()) * Value(100 / total) if total else Value(0.0)
+
+    enrolled = Enrollment.objects.filter(course_id=course_id).order_by('user_id')
+    last_user_id = 0
+    while True:
+        user_ids = list(enrolled.filter(user_id__gt=last_user_id).values_list(
+            'user_id', flat=True)[:chunk_size])
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        with transaction.atomic():
+            Progress.objects.filter(course_id=course_id, user_id__in=user_ids).exclude(
+                progress=percent).update(progress=percent, updated_at=timezone.now())
+
+            missing = set(user_ids) - set(Progress.objects.filter(
+                course_id=course_id, user_id__in=user_ids).values_list('user_id', flat=True))
+            counts = dict(CourseCompletion.objects.filter(
+                course_id=course_id, user_id__in=missing).values_list('user_id', 'completed_count'))
+            Progress.objects.bulk_create([
+                Progress(user_id=user_id, course_id=course_id,
+                         progress=counts.get(user_id, 0) * 100 / total if total else 0)
+                for user_id in missing
+            ], ignore_conflicts=True)
+
+
+def refresh_stale_progress():
+    stale = list(Course.objects.filter(
+        progress_stale_since__isnull=False).values_list('pk', 'progress_stale_since'))
+    refreshed = 0
+    for course_id, stale_since in stale:
+        # cleared before the run, so edits made meanwhile mark the course
+        # again; the conditional update also keeps two workers apart
+        if not Course.objects.filter(pk=course_id, progress_stale_since__isnull=False).update(
+                progress_stale_since=None):
+            continue
+        try:
+            refresh_course_progress(course_id)
+        except Exception:
+            # marked again, so a failed run is retried instead of forgotten
+            Course.objects.filter(pk=course_id, progress_stale_since__isnull=True).update(
+                progress_stale_since=stale_since)
+            raise
+        refreshed += 1
+    return refreshed
+
+
+def schedule_progress_refresh():
+    # set PROGRESS_REFRESH_DELAY to None to leave it to the refresh_progress
+    # command instead
+    run_later(getattr(settings, 'PROGRESS_REFRESH_DELAY', None), refresh_stale_progress)
@@ -0,0 +1,163 @@
+import datetime
+import posixpath
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .completion import forget_slots
+from .counters import adjust_course_modules, adjust_module_contents
+from .facets import adjust_category_facets, adjust_facet
+from .jobs import run_later
+from .models import (CatalogFacet, CompletedContent, Content, Course, CourseCompletion,
+                     CourseDailyStats, Enrollment, File, Image, Module, Progress, Review)
+from .models.content import ITEM_MODELS
+from .outline import bump_outline_version
+from .progress import mark_progress_stale
+
+PURGE_BATCH_SIZE = 500
+# items and files younger than this may belong to a Content that is still
+# being created, so the GC leaves them alone
+ORPHAN_GRACE = datetime.timedelta(hours=1)
+FILE_MODELS = (File, Image)
+
+
+# Soft delete: the rows are hidden from every default manager at once and the
+# counters, slots and outline change as if they were gone; the rows
+# themselves are left to purge_deleted()
+
+def delete_content(content):
+    with transaction.atomic():
+        if not Content.objects.filter(pk=content.pk).update(deleted_at=timezone.now()):
+            return
+        adjust_module_contents(content.module_id, -1)
+        forget_slots([content.slot], modules=content.module_id)
+        mark_progress_stale(modules=content.module_id)
+        bump_outline_version(modules=content.module_id)
+        transaction.on_commit(schedule_purge)
+
+
+def delete_module(module):
+    now = timezone.now()
+    with transaction.atomic():
+        if not Module.objects.filter(pk=module.pk).update(deleted_at=now):
+            return
+        contents = Content.objects.filter(module=module)
+        slots = list(contents.values_list('slot', flat=True))
+        contents.update(deleted_at=now)
+        adjust_course_modules(module.course_id, -1, -len(slots))
+        forget_slots(slots, pk=module.course_id)
+        mark_progress_stale(pk=module.course_id)
+        bump_outline_version(pk=module.course_id)
+        transaction.on_commit(schedule_purge)
+
+
+def _deleted_slug(course):
+    # the unique slug is handed back at once instead of after the purge
+    suffix = f'--deleted-{course.pk}'
+    max_length = Course._meta.get_field('slug').max_length
+    return f'{course.slug[:max_length - len(suffix)]}{suffix}'
+
+
+def delete_course(course):
+    now = timezone.now()
+    with transaction.atomic():
+        if not Course.objects.filter(pk=course.pk).update(
+                deleted_at=now, slug=_deleted_slug(course)):
+            return
+        Module.objects.filter(course=course).update(deleted_at=now)
+        Content.objects.filter(module__course=course).update(deleted_at=now)
+        adjust_facet(CatalogFacet.LEVEL, course.level, course.level, -1)
+        adjust_category_facets(course.categories.values_list('id', flat=True), -1)
+        transaction.on_commit(schedule_purge)
+
+
+def _delete_in_batches(queryset, batch_size):
+    # one short transaction per batch, so no lock is held for long
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += queryset.model._base_manager.filter(pk__in=ids).delete()[0]
+
+
+def _delete_stored_files(names):
+    # clones share the stored file of the original, so it goes only when no
+    # File or Image row points at it any more
+    for name in names:
+        if not any(model.objects.filter(file=name).exists() for model in FILE_MODELS):
+            File._meta.get_field('file').storage.delete(name)
+
+
+def collect_orphaned_items(batch_size=PURGE_BATCH_SIZE, grace=ORPHAN_GRACE):
+    """
+    Deletes the Text/Video/File/Image rows no Content points at, with their
+    stored files. Contents waiting for the purge still count as references.
+    """
+    deleted = 0
+    for model in ITEM_MODELS:
+        referenced = Content.all_objects.filter(
+            content_type=ContentType.objects.get_for_model(model), object_id=OuterRef('pk'))
+        orphans = model.objects.filter(
+            created_at__lt=timezone.now() - grace).exclude(Exists(referenced))
+        while True:
+            items = list(orphans[:batch_size])
+            if not items:
+                break
+            with transaction.atomic():
+                deleted += model.objects.filter(pk__in=[item.pk for item in items]).delete()[0]
+            if model in FILE_MODELS:
+                _delete_stored_files({item.file.name for item in items if item.file})
+    return deleted
+
+
+def collect_orphaned_files(grace=ORPHAN_GRACE):
+    # files left behind by items whose file was replaced, or by aborted uploads
+    deleted = 0
+    cutoff = timezone.now() - grace
+    for model in FILE_MODELS:
+        field = model._meta.get_field('file')
+        storage, directory = field.storage, field.upload_to
+        try:
+            _, names = storage.listdir(directory)
+        except FileNotFoundError:
+            continue
+        referenced = set()
+        for file_model in FILE_MODELS:
+            referenced.update(file_model.objects.filter(
+                file__startswith=f'{directory}/').values_list('file', flat=True))
+        for name in names:
+            path = posixpath.join(directory, name)
+            if path not in referenced and storage.get_modified_time(path) < cutoff:
+                storage.delete(path)
+                deleted += 1
+    return deleted
+
+
+def purge_deleted(batch_size=PURGE_BATCH_SIZE, grace=ORPHAN_GRACE):
+    """
+    Removes the soft-deleted courses, modules and contents bottom-up in
+    batches of ``batch_size`` rows, then garbage collects the items and files
+    nothing refers to. Returns the number of rows deleted.
+    """
+    dead_courses = {'course__deleted_at__isnull': False}
+    steps = [
+        CompletedContent.objects.filter(content__deleted_at__isnull=False),
+        CourseCompletion.objects.filter(**dead_courses),
+        Progress.objects.filter(**dead_courses),
+        Enrollment.objects.filter(**dead_courses),
+        Review.objects.filter(**dead_courses),
+        CourseDailyStats.objects.filter(**dead_courses),
+        Content.all_objects.filter(deleted_at__isnull=False),
+        Module.all_objects.filter(deleted_at__isnull=False),
+        Course.all_objects.filter(deleted_at__isnull=False),
+    ]
+    deleted = sum(_delete_in_batches(queryset, batch_size) for queryset in steps)
+    return deleted + collect_orphaned_items(batch_size, grace)
+
+
+def schedule_purge():
+    # set PURGE_DELAY to None to leave it to the purge_deleted command
+    run_later(getattr(settings, 'PURGE_DELAY', None), purge_deleted)
@@ -0,0 +1,80 @@
+import unicodedata
+from django.contrib.postgres.search import (SearchQuery, SearchRank, SearchVector,
+                                            TrigramWordSimilarity)
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Cast
+from .models import Course, CourseSearchIndex
+
+SEARCH_CONFIG = 'spanish'
+# ranking scores are compared as integers in millionths
+RANK_SCALE = 1000000
+
+
+def normalize(text):
+    # lowercase and strip accents so "programación" matches "programacion"
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def is_postgres(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def index_courses(course_ids):
+    courses = (Course.objects.filter(id__in=course_ids)
+               .select_related('owner').prefetch_related('categories'))
+
+    for course in courses:
+        title = normalize(course.title)
+        categories = normalize(' '.join(c.name for c in course.categories.all()))
+        instructor = normalize(course.owner.get_full_name())
+        overview = normalize(course.overview)
+
+        defaults = {
+            'title': title,
+            'document': ' '.join([title, categories, instructor, overview]),
+        }
+        if is_postgres(courses.db):
+            defaults['search_vector'] = (
+                SearchVector(Value(title), weight='A', config=SEARCH_CONFIG)
+                + SearchVector(Value(categories), weight='B', config=SEARCH_CONFIG)
+                + SearchVector(Value(instructor), weight='B', config=SEARCH_CONFIG)
+                + SearchVector(Value(overview), weight='C', config=SEARCH_CONFIG)
+            )
+
+        CourseSearchIndex.objects.update_or_create(course=course, defaults=defaults)
+
+
+def _exact(score):
+    return Cast(score * Value(RANK_SCALE), IntegerField())
+
+
+def search_courses(queryset, query):
+    text = normalize(query).strip()
+    if not text:
+        return queryset
+
+    if is_postgres(queryset.db):
+        search_query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch')
+        # rank and similarity are float4; scaled to integers they stay exact
+        # through the JSON cursor, so the keyset comparison neither skips
+        # nor repeats rows at page boundaries
+        return (queryset
+                .annotate(rank=_exact(SearchRank(F('search_index__search_vector'), search_query)),
+                          similarity=_exact(TrigramWordSimilarity(text, 'search_index__document')))
+                .filter(Q(search_index__search_vector=search_query) |
+                        Q(search_index__document__trigram_word_similar=text))
+                .order_by('-rank', '-similarity', '-created_at', '-id'))
+
+    # portable fallback: every term must appear, title hits weigh more
+    terms = text.split()
+    rank = Value(0)
+    for term in terms:
+        queryset = queryset.filter(search_index__document__contains=term)
+        rank = rank + Case(
+            When(search_index__title__contains=term, then=Value(3)),
+            default=Value(1), output_field=IntegerField())
+
+    return queryset.annotate(rank=rank).order_by('-rank', '-created_at', '-id')
@@ -0,0 +1,274 @@
+from collections import Counter
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .completion import allocate_slots, clear_completed, forget_slots, set_completed
+from .counters import adjust_course_modules, adjust_course_reviews, adjust_module_contents
+from .facets import adjust_category_facets, adjust_facet
+from .models import (CatalogFacet, Category, CompletedContent, Content, Course,
+                     CourseCategory, Module, Review)
+from .models.content import ITEM_MODELS
+from .outline import bump_outline_version
+from .progress import mark_progress_stale
+from .search import index_courses
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_level(sender, instance, raw=False, **kwargs):
+    instance._previous_level = None
+    if instance.pk and not raw:
+        instance._previous_level = Course.objects.filter(
+            pk=instance.pk).values_list('level', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    index_courses([instance.pk])
+
+    previous = getattr(instance, '_previous_level', None)
+    if created or previous != instance.level:
+        adjust_facet(CatalogFacet.LEVEL, previous, previous, -1)
+        adjust_facet(CatalogFacet.LEVEL, instance.level, instance.level, 1)
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    # a soft-deleted course took itself off the facets already
+    if instance.deleted_at:
+        return
+    adjust_facet(CatalogFacet.LEVEL, instance.level, instance.level, -1)
+
+
+@receiver(post_save, sender=CourseCategory)
+def course_category_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    index_courses([instance.course_id])
+    if created:
+        adjust_category_facets([instance.category_id], 1)
+
+
+@receiver(post_delete, sender=CourseCategory)
+def course_category_deleted(sender, instance, **kwargs):
+    if not Course.all_objects.filter(pk=instance.course_id, deleted_at__isnull=False).exists():
+        adjust_category_facets([instance.category_id], -1)
+    # wait for commit: when the course itself is being deleted the index row
+    # must not be recreated in the middle of the cascade
+    course_id = instance.course_id
+    transaction.on_commit(lambda: index_courses([course_id]))
+
+
+@receiver(m2m_changed, sender=Course.categories.through)
+def course_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # the through rows are bulk created/deleted here, so no post_save or
+    # post_delete is sent for them; work out the (course, category) pairs
+    if action in ('pre_remove', 'pre_clear'):
+        rows = CourseCategory.objects.filter(
+            **{'category' if reverse else 'course': instance})
+        if action == 'pre_remove':
+            rows = rows.filter(**{'course__in' if reverse else 'category__in': pk_set})
+        instance._removed_course_categories = list(
+            rows.values_list('course_id', 'category_id'))
+        return
+
+    if action == 'post_add':
+        pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+        delta = 1
+    elif action in ('post_remove', 'post_clear'):
+        pairs = getattr(instance, '_removed_course_categories', [])
+        delta = -1
+    else:
+        return
+
+    index_courses({course_id for course_id, _ in pairs})
+    for category_id, count in Counter(c for _, c in pairs).items():
+        adjust_category_facets([category_id], delta * count)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_courses(instance.courses.values_list('id', flat=True))
+    CatalogFacet.objects.filter(facet=CatalogFacet.CATEGORY, value=str(
+        instance.pk)).update(label=instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    CatalogFacet.objects.filter(
+        facet=CatalogFacet.CATEGORY, value=str(instance.pk)).delete()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_owner_courses(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # logins save last_login only; the name is what the index cares about
+    if update_fields and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    index_courses(instance.owned_courses.values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Module)
+def remember_module_course(sender, instance, raw=False, **kwargs):
+    instance._previous_course_id = None
+    if instance.pk and not raw:
+        instance._previous_course_id = Module.objects.filter(
+            pk=instance.pk).values_list('course_id', flat=True).first()
+
+
+@receiver(post_save, sender=Module)
+def module_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_course_id', None)
+    if created:
+        adjust_course_modules(instance.course_id, 1)
+    elif previous and previous != instance.course_id:
+        contents = Module.objects.filter(pk=instance.pk).values_list(
+            'content_count', flat=True).first() or 0
+        adjust_course_modules(previous, -1, -contents)
+        adjust_course_modules(instance.course_id, 1, contents)
+        move_module_slots(instance, previous)
+        mark_progress_stale(pk__in=[previous, instance.course_id])
+        bump_outline_version(pk=previous)
+    bump_outline_version(pk=instance.course_id)
+
+
+def move_module_slots(module, previous_course_id):
+    # slots belong to a course: the moved contents get new ones and their
+    # bits are cleared in the course they left
+    contents = list(module.contents.order_by('order', 'id'))
+    forget_slots([content.slot for content in contents], pk=previous_course_id)
+    slots = allocate_slots(module.course_id, len(contents)) or ()
+    for content, slot in zip(contents, slots):
+        content.slot = slot
+    Content.objects.bulk_update(contents, ['slot'])
+
+
+@receiver(post_delete, sender=Module)
+def module_deleted(sender, instance, **kwargs):
+    # its contents were deleted first and already took their share off
+    if instance.deleted_at:
+        return
+    adjust_course_modules(instance.course_id, -1)
+    bump_outline_version(pk=instance.course_id)
+
+
+@receiver(pre_save, sender=Content)
+def remember_content_module(sender, instance, raw=False, **kwargs):
+    instance._previous_module_id = None
+    instance._left_course = None
+    if raw:
+        return
+
+    previous = None
+    if instance.pk:
+        previous = Content.objects.filter(pk=instance.pk).values_list(
+            'module_id', 'module__course_id', 'slot').first()
+    if previous:
+        instance._previous_module_id, course_id, slot = previous
+        moved = instance.module_id != instance._previous_module_id
+        if moved and course_id != instance.module.course_id:
+            instance._left_course = (course_id, slot)
+            instance.slot = None
+    if instance.slot is None:
+        instance.slot = (allocate_slots(instance.module.course_id) or [None])[0]
+
+
+@receiver(post_save, sender=Content)
+def content_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_module_id', None)
+    if created:
+        adjust_module_contents(instance.module_id, 1)
+        mark_progress_stale(modules=instance.module_id)
+    elif previous and previous != instance.module_id:
+        adjust_module_contents(previous, -1)
+        adjust_module_contents(instance.module_id, 1)
+        if instance._left_course:
+            course_id, slot = instance._left_course
+            forget_slots([slot], pk=course_id)
+            mark_progress_stale(pk__in=[course_id, instance.module.course_id])
+        bump_outline_version(modules=previous)
+    bump_outline_version(modules=instance.module_id)
+
+
+@receiver(post_delete, sender=Content)
+def content_deleted(sender, instance, **kwargs):
+    # soft-deleted contents were accounted for when they were hidden
+    if instance.deleted_at:
+        return
+    adjust_module_contents(instance.module_id, -1)
+    forget_slots([instance.slot], modules=instance.module_id)
+    mark_progress_stale(modules=instance.module_id)
+    bump_outline_version(modules=instance.module_id)
+
+
+@receiver(post_save, sender=CompletedContent)
+def completed_content_saved(sender, instance, created, raw=False, **kwargs):
+    # rows written through the model API still reach the bitmaps
+    if created and not raw:
+        course_id, slot = Content.objects.filter(pk=instance.content_id).values_list(
+            'module__course_id', 'slot').get()
+        if slot is not None:
+            set_completed(instance.user_id, course_id, slot)
+
+
+@receiver(post_delete, sender=CompletedContent)
+def completed_content_deleted(sender, instance, **kwargs):
+    # hidden contents already had their bits cleared when they were deleted
+    row = Content.objects.filter(pk=instance.content_id).values_list(
+        'module__course_id', 'slot').first()
+    if row and row[1] is not None:
+        clear_completed(instance.user_id, *row)
+
+
+def item_changed(sender, instance, raw=False, **kwargs):
+    # outlines show the item title
+    if raw:
+        return
+    bump_outline_version(
+        modules__contents__content_type=ContentType.objects.get_for_model(sender),
+        modules__contents__object_id=instance.pk)
+
+
+for item_model in ITEM_MODELS:
+    post_save.connect(item_changed, sender=item_model)
+    post_delete.connect(item_changed, sender=item_model)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_review = None
+    if instance.pk and not raw:
+        instance._previous_review = Review.objects.filter(
+            pk=instance.pk).values_list('course_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_review', None)
+    if created or previous is None:
+        adjust_course_reviews(instance.course_id, 1, instance.rating)
+        return
+
+    course_id, rating = previous
+    if course_id != instance.course_id:
+        adjust_course_reviews(course_id, -1, -rating)
+        adjust_course_reviews(instance.course_id, 1, instance.rating)
+    elif rating != instance.rating:
+        adjust_course_reviews(course_id, 0, instance.rating - rating)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    adjust_course_reviews(instance.course_id, -1, -instance.rating)
@@ -1,3 +1,1355 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import zipfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.profiles.models import InstructorProfile, Profile
+from .enrollments import is_enrolled
+from .facets import catalog_facets, rebuild_facets
+from .analytics import rollup_engagement, rollup_state, schedule_rollup
+from .cloning import _copy_slug, clone_course
+from .completion import assign_missing_slots, import_completed_rows, mark_completed
+from .counters import rebuild_counters, stale_counters
+from .models import (CatalogFacet, Category, CompletedContent, Content, Course,
+                     CourseCategory, CourseCompletion, CourseDailyStats, Enrollment, File,
+                     Module, Review, RollupState, Text, Video)
+from .lesson_search import lesson_index
+from .outline import course_outline
+from .packages import PackageError, import_package
+from .pagination import CursorPaginator
+from .progress import course_progress, refresh_stale_progress
+from .purge import delete_course, delete_module, purge_deleted
+from .search import search_courses
 
-# Create your tests here.
+User = get_user_model()
+
+
+def make_course(owner, title, **kwargs):
+    kwargs.setdefault('slug', title.lower().replace(' ', '-'))
+    kwargs.setdefault('overview', '')
+    kwargs.setdefault('image', 'https://example.com/course.jpg')
+    kwargs.setdefault('level', 'Principiante')
+    return Course.objects.create(owner=owner, title=title, **kwargs)
+
+
+def make_text(module, title='Lección', body=''):
+    item = Text.objects.create(owner=module.course.owner, title=title, content=body)
+    return Content.objects.create(module=module, item=item)
+
+
+class CourseSearchTests(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            'ana', first_name='Ana', last_name='Pérez', is_instructor=True)
+        self.django = make_course(
+            self.instructor, 'Django desde cero', overview='Aprende Python web')
+        self.python = make_course(
+            self.instructor, 'Python avanzado', overview='Incluye algo de Django')
+
+    def search(self, query):
+        return list(search_courses(Course.objects.all(), query))
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('django'), [self.django, self.python])
+
+    def test_accents_are_ignored(self):
+        self.assertEqual(len(self.search('perez')), 2)
+        self.assertEqual(self.search('PYTHÓN avanzado'), [self.python])
+
+    def test_category_changes_are_indexed(self):
+        category = Category.objects.create(name='Backend', slug='backend')
+        CourseCategory.objects.create(course=self.django, category=category)
+        self.assertEqual(self.search('backend'), [self.django])
+
+        self.python.categories.add(category)
+        self.assertEqual(len(self.search('backend')), 2)
+
+        category.name = 'Servidores'
+        category.save()
+        self.assertEqual(self.search('backend'), [])
+        self.assertEqual(len(self.search('servidores')), 2)
+
+    def test_instructor_rename_is_indexed(self):
+        self.instructor.last_name = 'Gómez'
+        self.instructor.save()
+        self.assertEqual(self.search('perez'), [])
+        self.assertEqual(len(self.search('gomez')), 2)
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('ana', is_instructor=True)
+        # same created_at for every course: the id tiebreaker does the work
+        self.courses = [make_course(owner, f'Curso {i}') for i in range(7)]
+        self.expected = sorted(self.courses, key=lambda c: c.id, reverse=True)
+
+    def test_walks_forward_and_back(self):
+        paginator = CursorPaginator(Course.objects.all(), 3)
+
+        first = paginator.page()
+        self.assertEqual(first.object_list, self.expected[:3])
+        self.assertFalse(first.has_previous())
+
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(second.object_list, self.expected[3:6])
+
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(third.object_list, self.expected[6:])
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(back.object_list, self.expected[3:6])
+        self.assertEqual(paginator.page(back.previous_cursor).object_list, self.expected[:3])
+
+    def test_last_page_and_bad_cursor(self):
+        paginator = CursorPaginator(Course.objects.all(), 3)
+        last = paginator.page(paginator.page().last_cursor)
+        self.assertEqual(last.object_list, self.expected[4:])
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+        self.assertEqual(paginator.page('basura').object_list, self.expected[:3])
+
+
+class CatalogQueryCountTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user('luis')
+        Profile.objects.create(user=self.student)
+        self.client.force_login(self.student)
+
+    def add_courses(self, count):
+        for _ in range(count):
+            n = User.objects.count()
+            owner = User.objects.create_user(
+                f'instructor{n}', first_name='Ana', last_name=str(n), is_instructor=True)
+            InstructorProfile.objects.create(user=owner, photo='https://example.com/a.jpg')
+            make_course(owner, f'Curso {n}')
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        url = reverse('student:course_list')
+
+        self.add_courses(1)
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+        self.add_courses(11)
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, 'course-card', count=8)
+        self.assertContains(response, 'https://example.com/a.jpg', count=8)
+
+
+class EnrollmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.student = User.objects.create_user('luis')
+        self.enrolled = make_course(owner, 'Django')
+        self.other = make_course(owner, 'Python')
+        Enrollment.objects.create(user=self.student, course=self.enrolled)
+
+    def test_enrollment_filters(self):
+        self.assertEqual(list(Course.objects.enrolled_by(self.student)), [self.enrolled])
+        self.assertEqual(list(Course.objects.not_enrolled_by(self.student)), [self.other])
+
+    def test_is_enrolled_reads_the_database(self):
+        self.assertTrue(is_enrolled(self.student, self.enrolled))
+        with self.assertNumQueries(1):
+            self.assertFalse(is_enrolled(self.student, self.other))
+
+        enrollment = Enrollment.objects.create(user=self.student, course=self.other)
+        self.assertTrue(is_enrolled(self.student, self.other))
+
+        enrollment.delete()
+        self.assertFalse(is_enrolled(self.student, self.other))
+
+    def test_enroll_then_open_lessons(self):
+        # nothing per process may hold the old enrollments: the redirect
+        # after enrolling can land on any worker
+        self.client.force_login(self.student)
+        lessons = reverse('student:course_lessons', args=[self.other.slug])
+        self.assertRedirects(self.client.get(lessons),
+                             reverse('student:course_detail', args=[self.other.slug]))
+
+        response = self.client.post(reverse('student:course_enroll', args=[self.other.slug]))
+        self.assertRedirects(response, lessons)
+        response = self.client.get(reverse('student:review_course', args=[self.other.slug]))
+        self.assertEqual(response.status_code, 200)
+
+
+class CatalogFacetTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.web = Category.objects.create(name='Web', slug='web')
+        self.data = Category.objects.create(name='Datos', slug='datos')
+
+    def counts(self):
+        return {(f.facet, f.label): f.count for f in CatalogFacet.objects.filter(count__gt=0)}
+
+    def assertMatchesRebuild(self, expected):
+        self.assertEqual(self.counts(), expected)
+        rebuild_facets()
+        self.assertEqual(self.counts(), expected)
+
+    def test_counts_follow_course_and_category_changes(self):
+        django = make_course(self.owner, 'Django', level='Principiante')
+        pandas = make_course(self.owner, 'Pandas', level='Principiante')
+        django.categories.add(self.web, self.data)
+        CourseCategory.objects.create(course=pandas, category=self.data)
+        self.assertMatchesRebuild({
+            ('category', 'Web'): 1, ('category', 'Datos'): 2, ('level', 'Principiante'): 2})
+
+        django.level = 'Avanzado'
+        django.save()
+        django.categories.remove(self.data)
+        self.data.courses.clear()
+        self.assertMatchesRebuild({
+            ('category', 'Web'): 1, ('level', 'Principiante'): 1, ('level', 'Avanzado'): 1})
+
+        django.delete()
+        self.assertMatchesRebuild({('level', 'Principiante'): 1})
+
+    def test_catalog_filters_by_facet(self):
+        django = make_course(self.owner, 'Django', level='Avanzado')
+        make_course(self.owner, 'Pandas', level='Principiante')
+        django.categories.add(self.web)
+
+        student = User.objects.create_user('luis')
+        self.client.force_login(student)
+        url = reverse('student:course_list')
+
+        response = self.client.get(url, {'category': self.web.pk})
+        self.assertEqual(list(response.context['courses_obj']), [django])
+        response = self.client.get(url, {'level': 'Principiante'})
+        self.assertEqual([c.title for c in response.context['courses_obj']], ['Pandas'])
+
+        web = catalog_facets()['category'][0]
+        self.assertEqual((web.label, web.count), ('Web', 1))
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(owner, 'Django')
+
+    def assertCounts(self, course_counts, module_counts):
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.module_count, self.course.content_count), course_counts)
+        self.assertEqual(
+            [m.content_count for m in self.course.modules.order_by('order')], module_counts)
+        self.assertEqual([list(qs) for qs in stale_counters()], [[], []])
+
+    def test_counters_follow_structure_changes(self):
+        first = Module.objects.create(course=self.course, title='Uno')
+        second = Module.objects.create(course=self.course, title='Dos')
+        contents = [make_text(first) for _ in range(3)]
+        self.assertCounts((2, 3), [3, 0])
+
+        contents[0].module = second
+        contents[0].save()
+        self.assertCounts((2, 3), [2, 1])
+
+        contents[1].delete()
+        self.assertCounts((2, 2), [1, 1])
+
+        first.delete()
+        self.assertCounts((1, 1), [1])
+
+    def test_stale_instance_save_keeps_counters(self):
+        module = Module.objects.create(course=self.course, title='Uno')
+        make_text(module)
+        self.course.title = 'Django 5'
+        self.course.save()
+        module.save()
+        self.assertCounts((1, 1), [1])
+
+    def test_rebuild_repairs_drift(self):
+        module = Module.objects.create(course=self.course, title='Uno')
+        make_text(module)
+        Course.objects.update(content_count=7)
+        Module.objects.update(content_count=0)
+
+        self.assertEqual(rebuild_counters(), (1, 1))
+        self.assertCounts((1, 1), [1])
+
+
+class ContentItemPrefetchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(self.owner, 'Django')
+        self.module = Module.objects.create(course=self.course, title='Uno')
+        Enrollment.objects.create(user=self.owner, course=self.course)
+        self.client.force_login(self.owner)
+
+    def add_contents(self):
+        make_text(self.module, 'Lectura')
+        video = Video.objects.create(owner=self.owner, title='Video', url='https://example.com/v')
+        Content.objects.create(module=self.module, item=video)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_item_queries_do_not_grow_with_contents(self):
+        urls = [
+            reverse('student:course_detail', args=[self.course.slug]),
+            reverse('student:course_lessons', args=[self.course.slug]),
+            reverse('instructor:content_list', args=[self.module.id]),
+        ]
+        self.add_contents()
+        # warm the per-process caches (content types, enrolled ids)
+        for url in urls:
+            self.count_queries(url)
+        before = [self.count_queries(url) for url in urls]
+        for _ in range(5):
+            self.add_contents()
+        # the first views after the change rebuild the course outline
+        for url in urls:
+            self.count_queries(url)
+        self.assertEqual([self.count_queries(url) for url in urls], before)
+
+    def test_outline_defers_text_body(self):
+        make_text(self.module, 'Lectura', 'cuerpo largo')
+        content = Content.objects.with_items('title').get()
+        self.assertEqual(content.item.title, 'Lectura')
+        self.assertIn('content', content.item.get_deferred_fields())
+
+
+class ReviewStatsTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(owner, 'Django')
+        self.students = [User.objects.create_user(f'alumno{i}') for i in range(3)]
+
+    def assertStats(self, count, total, rating):
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.review_count, self.course.rating_sum), (count, total))
+        self.assertAlmostEqual(self.course.rating, rating)
+        self.assertEqual(list(stale_counters()[1]), [])
+
+    def test_stats_follow_reviews(self):
+        reviews = [Review.objects.create(user=student, course=self.course, rating=rating)
+                   for student, rating in zip(self.students, (5, 4, 3))]
+        self.assertStats(3, 12, 4.0)
+
+        reviews[2].rating = 1
+        reviews[2].save()
+        self.assertStats(3, 10, 10 / 3)
+
+        reviews[0].delete()
+        self.assertStats(2, 5, 2.5)
+
+        Review.objects.all().delete()
+        self.assertStats(0, 0, 0.0)
+
+    def test_review_view_updates_course_rating(self):
+        student = self.students[0]
+        Enrollment.objects.create(user=student, course=self.course)
+        self.client.force_login(student)
+        url = reverse('student:review_course', args=[self.course.slug])
+
+        self.client.post(url, {'rating': 4, 'comment': ''})
+        self.assertStats(1, 4, 4.0)
+        self.client.post(url, {'rating': 2, 'comment': 'Regular'})
+        self.assertStats(1, 2, 2.0)
+
+
+class ReviewListTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(owner, 'Django')
+        for i in range(23):
+            student = User.objects.create_user(f'alumno{i}')
+            Review.objects.create(user=student, course=self.course, rating=5, comment=f'opinion {i}')
+        self.client.force_login(owner)
+
+    def test_detail_renders_first_page_and_endpoint_pages_the_rest(self):
+        response = self.client.get(reverse('student:course_detail', args=[self.course.slug]))
+        self.assertContains(response, 'class="review"', count=10)
+        cursor = response.context['reviews'].next_cursor
+
+        seen = [r.comment for r in response.context['reviews']]
+        url = reverse('student:course_reviews', args=[self.course.slug])
+        while cursor:
+            data = self.client.get(url, {'cursor': cursor}).json()
+            seen += [f'opinion {i}' for i in range(23) if f'opinion {i}<' in data['html']]
+            cursor = data['next']
+
+        self.assertEqual(sorted(seen), sorted(f'opinion {i}' for i in range(23)))
+
+
+class CourseProgressTests(TestCase):
+    def test_progress_in_one_query(self):
+        owner = User.objects.create_user('ana', is_instructor=True)
+        student = User.objects.create_user('luis')
+        course = make_course(owner, 'Django')
+        first = Module.objects.create(course=course, title='Uno')
+        second = Module.objects.create(course=course, title='Dos')
+        empty = Module.objects.create(course=course, title='Tres')
+        contents = [make_text(first), make_text(first), make_text(second)]
+        for content in contents[:2]:
+            CompletedContent.objects.create(user=student, content=content)
+        # someone else's progress must not count
+        CompletedContent.objects.create(user=owner, content=contents[2])
+
+        course.refresh_from_db()
+        course_outline(course)
+        with self.assertNumQueries(1):
+            progress = course_progress(student, course)
+
+        self.assertEqual(progress.for_module(first.id), (2, 2))
+        self.assertEqual(progress.for_module(second.id), (0, 1))
+        self.assertEqual(progress.for_module(empty.id), (0, 0))
+        self.assertEqual(progress.completed_ids, {contents[0].id, contents[1].id})
+        self.assertAlmostEqual(progress.percent, 200 / 3)
+
+
+class LessonWritesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.student = User.objects.create_user('luis')
+        self.course = make_course(owner, 'Django')
+        self.content = make_text(Module.objects.create(course=self.course, title='Uno'))
+        self.client.force_login(self.student)
+        self.url = reverse('student:course_lessons', args=[self.course.slug])
+
+    def test_lessons_require_explicit_enrollment(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse('student:course_detail', args=[self.course.slug]))
+        self.assertFalse(Enrollment.objects.exists())
+
+        enroll = reverse('student:course_enroll', args=[self.course.slug])
+        self.assertEqual(self.client.get(enroll).status_code, 405)
+        self.assertRedirects(self.client.post(enroll), self.url)
+        self.client.post(enroll)
+        self.assertEqual(Enrollment.objects.filter(user=self.student).count(), 1)
+
+    def test_repeated_lesson_views_do_not_write(self):
+        Enrollment.objects.create(user=self.student, course=self.course)
+        self.client.get(self.url)
+        self.assertEqual(self.client.session['last_course_slug'], self.course.slug)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        writes = [q['sql'] for q in queries.captured_queries
+                  if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+
+        CompletedContent.objects.create(user=self.student, content=self.content)
+        self.client.get(self.url)
+        self.assertEqual(self.student.progress_set.get().progress, 100)
+
+
+class CourseOutlineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(self.owner, 'Django')
+        self.first = Module.objects.create(course=self.course, title='Uno')
+        self.second = Module.objects.create(course=self.course, title='Dos')
+        self.contents = [make_text(self.first, 'A'), make_text(self.first, 'B'),
+                         make_text(self.second, 'C')]
+
+    def outline(self):
+        self.course.refresh_from_db()
+        return course_outline(self.course)
+
+    def test_next_content_crosses_modules(self):
+        outline = self.outline()
+        a, b, c = (content.id for content in self.contents)
+        self.assertEqual([m.title for m in outline.modules], ['Uno', 'Dos'])
+        self.assertEqual([x.title for x in outline.modules[0].contents], ['A', 'B'])
+        self.assertEqual(outline.next_content_id(b), c)
+        self.assertEqual(outline.contents[c].previous_id, b)
+        self.assertIsNone(outline.next_content_id(c))
+        self.assertEqual(outline.first_content_id(), a)
+
+    def test_outline_is_cached_until_changed(self):
+        outline = self.outline()
+        with self.assertNumQueries(0):
+            self.assertIs(course_outline(self.course), outline)
+
+        self.contents[0].item.title = 'A2'
+        self.contents[0].item.save()
+        self.assertEqual(self.outline().modules[0].contents[0].title, 'A2')
+
+        self.second.title = 'Dos bis'
+        self.second.save()
+        self.assertEqual(self.outline().modules[1].title, 'Dos bis')
+
+        self.contents[2].delete()
+        self.assertEqual(self.outline().modules[1].contents, ())
+
+    def test_reorder_bumps_version(self):
+        version = self.outline().version
+        self.client.force_login(self.owner)
+        self.client.post(reverse('instructor:module_order'),
+                         f'{{"order": [{self.second.id}, {self.first.id}]}}',
+                         content_type='application/json')
+        self.assertNotEqual(self.outline().version, version)
+        self.assertEqual([m.title for m in self.outline().modules], ['Dos', 'Uno'])
+
+    def test_mark_complete_moves_to_next_module(self):
+        student = User.objects.create_user('luis')
+        Enrollment.objects.create(user=student, course=self.course)
+        self.client.force_login(student)
+        response = self.client.post(
+            reverse('student:mark_complete', args=[self.contents[1].id]))
+        self.assertRedirects(response, reverse(
+            'student:course_lessons', args=[self.course.slug, self.contents[2].id]))
+
+
+class MarkCompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.student = User.objects.create_user('luis')
+        self.course = make_course(owner, 'Django')
+        first = Module.objects.create(course=self.course, title='Uno')
+        self.contents = [make_text(first), make_text(first),
+                         make_text(Module.objects.create(course=self.course, title='Dos'))]
+        self.client.force_login(self.student)
+
+    def complete(self, content):
+        return self.client.post(reverse('student:mark_complete_json', args=[content.id]))
+
+    def test_returns_progress_and_next_content(self):
+        Enrollment.objects.create(user=self.student, course=self.course)
+        data = self.complete(self.contents[1]).json()
+        self.assertEqual(data['module'], {
+            'id': self.contents[1].module_id, 'completed': 1, 'total': 2})
+        self.assertEqual(data['progress'], 33)
+        self.assertEqual(data['next'], self.contents[2].id)
+        self.assertAlmostEqual(self.student.progress_set.get().progress, 100 / 3)
+
+        # a double submit is a no-op rather than an IntegrityError
+        self.assertEqual(self.complete(self.contents[1]).json()['progress'], 33)
+        self.assertEqual(CompletedContent.objects.count(), 1)
+
+        self.assertIsNone(self.complete(self.contents[2]).json()['next'])
+
+    def test_requires_enrollment(self):
+        response = self.complete(self.contents[0])
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('error', response.json())
+        self.assertFalse(CompletedContent.objects.exists())
+
+
+class LessonSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(owner, 'Django')
+        module = Module.objects.create(course=self.course, title='Uno')
+        self.models = make_text(module, 'Modelos', 'Las migraciones crean tablas.')
+        self.migrations = make_text(module, 'Migraciones', 'Aplicar cambios al esquema.')
+        self.views = make_text(module, 'Vistas', '<p>Nada de migración aquí</p>')
+
+    def search(self, query):
+        self.course.refresh_from_db()
+        return [content.id for content in lesson_index(self.course).search(query)]
+
+    def test_titles_rank_above_bodies(self):
+        self.assertEqual(self.search('migracion'),
+                         [self.migrations.id, self.models.id, self.views.id])
+        # only the last term is matched as a prefix
+        self.assertEqual(self.search('migracion aqui'), [self.views.id])
+        self.assertEqual(self.search('crean tab'), [self.models.id])
+        self.assertEqual(self.search('crean nada'), [])
+
+    def test_only_changed_bodies_are_reindexed(self):
+        self.search('tablas')
+        before = lesson_index(self.course)
+
+        text = self.views.item
+        text.content = 'Plantillas y tablas'
+        text.save()
+        self.assertEqual(self.search('tablas'), [self.models.id, self.views.id])
+
+        after = lesson_index(self.course)
+        self.assertIsNot(after, before)
+        self.assertIs(after.bodies[self.models.id], before.bodies[self.models.id])
+        self.assertIsNot(after.bodies[self.views.id], before.bodies[self.views.id])
+
+    def test_endpoint_requires_enrollment(self):
+        student = User.objects.create_user('luis')
+        self.client.force_login(student)
+        url = reverse('student:lesson_search', args=[self.course.slug])
+        self.assertEqual(self.client.get(url, {'q': 'vis'}).status_code, 403)
+
+        Enrollment.objects.create(user=student, course=self.course)
+        results = self.client.get(url, {'q': 'vis'}).json()['results']
+        self.assertEqual([r['title'] for r in results], ['Vistas'])
+
+
+class CourseCompletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.student = User.objects.create_user('luis')
+        self.course = make_course(owner, 'Django')
+        self.module = Module.objects.create(course=self.course, title='Uno')
+        self.contents = [make_text(self.module) for _ in range(10)]
+
+    def completion(self):
+        return CourseCompletion.objects.get(user=self.student, course=self.course)
+
+    def progress(self):
+        self.course.refresh_from_db()
+        return course_progress(self.student, self.course)
+
+    def test_bits_follow_contents_not_order(self):
+        self.assertEqual([c.slot for c in self.contents], list(range(10)))
+        mark_completed(self.student, self.contents[9])
+        mark_completed(self.student, self.contents[9])
+        self.assertEqual(self.completion().completed_count, 1)
+        self.assertEqual(bytes(self.completion().bits), b'\0\2')
+
+        Content.objects.filter(pk=self.contents[9].pk).update(order=0)
+        self.assertEqual(self.progress().completed_ids, {self.contents[9].id})
+
+        self.contents[9].delete()
+        self.assertEqual(self.completion().completed_count, 0)
+        self.assertEqual(self.progress().percent, 0)
+        # slots are not reused
+        self.assertEqual(make_text(self.module).slot, 10)
+
+    def test_moving_a_module_clears_its_bits(self):
+        mark_completed(self.student, self.contents[0])
+        other = make_course(self.course.owner, 'Flask')
+        self.module.course = other
+        self.module.save()
+
+        self.assertEqual(self.completion().completed_count, 0)
+        self.assertEqual(sorted(Content.objects.values_list('slot', flat=True)), list(range(10)))
+        other.refresh_from_db()
+        self.assertEqual(other.content_slots, 10)
+
+    def test_rows_are_imported(self):
+        Content.objects.update(slot=None)
+        CompletedContent.objects.bulk_create([
+            CompletedContent(user=self.student, content=content) for content in self.contents[:3]])
+
+        self.assertEqual(assign_missing_slots(), 10)
+        self.assertEqual(import_completed_rows(), 1)
+        self.assertEqual(self.completion().completed_count, 3)
+        self.assertEqual(self.progress().completed_ids, {c.id for c in self.contents[:3]})
+
+    def test_no_slot_for_a_deleted_course(self):
+        content = self.contents[0]
+        content.slot = None
+        Course.objects.filter(pk=self.course.pk).update(deleted_at=timezone.now())
+        with self.assertRaises(Course.DoesNotExist):
+            mark_completed(self.student, content)
+        self.assertFalse(CompletedContent.objects.exists())
+
+    def test_model_api_deletes_clear_the_bit(self):
+        mark_completed(self.student, self.contents[0])
+        mark_completed(self.student, self.contents[1])
+        CompletedContent.objects.filter(content=self.contents[0]).delete()
+        self.assertEqual(self.completion().completed_count, 1)
+        self.assertEqual(self.progress().completed_ids, {self.contents[1].id})
+
+
+class ProgressRefreshTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(owner, 'Django')
+        self.module = Module.objects.create(course=self.course, title='Uno')
+        self.contents = [make_text(self.module) for _ in range(4)]
+        self.students = [User.objects.create_user(f'alumno{i}') for i in range(3)]
+        for student in self.students:
+            Enrollment.objects.create(user=student, course=self.course)
+        mark_completed(self.students[0], self.contents[0])
+        mark_completed(self.students[1], self.contents[0])
+        mark_completed(self.students[1], self.contents[1])
+        refresh_stale_progress()
+
+    def stored(self):
+        return {p.user_id: p.progress for p in self.course.progress_set.all()}
+
+    def test_structure_changes_refresh_all_students(self):
+        self.assertEqual(self.stored(), {
+            self.students[0].id: 25, self.students[1].id: 50, self.students[2].id: 0})
+
+        make_text(self.module)
+        self.contents[1].delete()
+        self.course.refresh_from_db()
+        self.assertIsNotNone(self.course.progress_stale_since)
+
+        self.assertEqual(refresh_stale_progress(), 1)
+        self.assertEqual(self.stored(), {
+            self.students[0].id: 25, self.students[1].id: 25, self.students[2].id: 0})
+        self.assertEqual(refresh_stale_progress(), 0)
+
+    def test_failed_refresh_keeps_the_course_stale(self):
+        make_text(self.module)
+        self.course.refresh_from_db()
+        stale_since = self.course.progress_stale_since
+        with mock.patch('apps.courses.progress.refresh_course_progress',
+                        side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            refresh_stale_progress()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.progress_stale_since, stale_since)
+        self.assertEqual(refresh_stale_progress(), 1)
+
+    def test_queries_do_not_grow_with_students(self):
+        def count(new_students):
+            for i in range(new_students):
+                student = User.objects.create_user(f'nuevo{new_students}-{i}')
+                Enrollment.objects.create(user=student, course=self.course)
+            make_text(self.module)
+            with CaptureQueriesContext(connection) as queries:
+                refresh_stale_progress()
+            return len(queries)
+
+        self.assertEqual(count(5), count(1))
+        self.assertEqual(len(self.stored()), 9)
+
+
+class ReorderTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(self.owner, 'Django')
+        self.module = Module.objects.create(course=self.course, title='Uno')
+        self.client.force_login(self.owner)
+
+    def reorder(self, order, version=None):
+        self.course.refresh_from_db()
+        payload = {'order': order,
+                   'version': str(version if version is not None else self.course.outline_version)}
+        return self.client.post(reverse('instructor:content_order'), json.dumps(payload),
+                                content_type='application/json')
+
+    def order(self):
+        return list(self.module.contents.order_by('order').values_list('id', flat=True))
+
+    def test_permutation_is_applied_in_one_statement(self):
+        def count(size):
+            Content.objects.all().delete()
+            for _ in range(size):
+                make_text(self.module)
+            order = self.order()[::-1]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.reorder(order)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.order(), order)
+            self.course.refresh_from_db()
+            self.assertEqual(response.json()['version'], str(self.course.outline_version))
+            return len(queries)
+
+        self.assertEqual(count(3), count(30))
+
+    def test_stale_and_foreign_reorders_are_rejected(self):
+        contents = [make_text(self.module) for _ in range(3)]
+        order = self.order()
+        self.course.refresh_from_db()
+        stale = self.course.outline_version
+        self.assertEqual(self.reorder(order[::-1]).status_code, 200)
+        self.assertEqual(self.reorder(order, stale).status_code, 409)
+        # a partial list would leave duplicate positions
+        self.assertEqual(self.reorder(order[:2]).status_code, 400)
+        for body in ('[]', '1'):
+            response = self.client.post(reverse('instructor:module_order'), body,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+        intruder = User.objects.create_user('eva', is_instructor=True)
+        self.client.force_login(intruder)
+        self.assertEqual(self.reorder(order).status_code, 400)
+        self.assertEqual(self.order(), [c.id for c in contents][::-1])
+
+
+class SparseOrderTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(owner, 'Django')
+        self.module = Module.objects.create(course=self.course, title='Uno')
+        self.contents = [make_text(self.module) for _ in range(4)]
+        self.field = Content._meta.get_field('order')
+
+    def order(self):
+        return list(self.module.contents.order_by('order').values_list('id', flat=True))
+
+    def test_inserts_leave_gaps(self):
+        self.assertEqual([c.order for c in self.contents], [1024, 2048, 3072, 4096])
+        self.assertEqual(Module.objects.create(course=self.course, title='Dos').order, 2048)
+
+    def test_move_writes_one_row_until_the_gap_runs_out(self):
+        a, b, c, d = self.contents
+        with CaptureQueriesContext(connection) as queries:
+            self.field.move(d, a, b)
+        writes = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self.order(), [a.id, d.id, b.id, c.id])
+
+        # keep squeezing items right after a until the gap is exhausted
+        for _ in range(12):
+            siblings = Content.objects.filter(module=self.module).order_by('order')
+            following = siblings.filter(order__gt=a.order).first()
+            last = siblings.last()
+            self.field.move(last, a, following)
+        orders = list(self.module.contents.order_by('order').values_list('order', flat=True))
+        self.assertEqual(len(set(orders)), 4)
+        self.assertEqual(self.order()[0], a.id)
+
+    def test_dragging_one_item_updates_only_that_row(self):
+        owner = self.course.owner
+        self.client.force_login(owner)
+        order = self.order()
+        order.insert(1, order.pop())
+        self.course.refresh_from_db()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('instructor:content_order'),
+                json.dumps({'order': order, 'version': str(self.course.outline_version)}),
+                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.order(), order)
+        updates = [q['sql'] for q in queries.captured_queries
+                   if q['sql'].startswith('UPDATE "courses_content"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('CASE', updates[0])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PackageImportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        Category.objects.create(name='Web')
+
+    def package(self, lessons=1, **manifest):
+        manifest = {
+            'title': 'Django', 'slug': 'django', 'overview': 'Curso',
+            'image': 'https://example.com/c.jpg', 'level': 'Principiante',
+            'categories': ['Web', 'Cocina'],
+            'modules': [
+                {'title': 'Uno', 'contents': [
+                    {'type': 'text', 'title': f'Lectura {i}', 'content': 'hola'}
+                    for i in range(lessons)
+                ] + [
+                    {'type': 'video', 'title': 'Video', 'url': 'https://example.com/v'},
+                    {'type': 'file', 'title': 'Guía', 'path': 'files/guia.pdf'},
+                    {'type': 'image', 'title': 'Mapa', 'path': 'img/mapa.png'},
+                    {'type': 'audio', 'title': 'Podcast'},
+                    {'type': 'file', 'title': 'Falta', 'path': 'files/otra.pdf'},
+                ]},
+                {'title': 'Dos', 'contents': [{'type': 'video', 'title': 'Sin url', 'url': 'x'}]},
+            ],
+            **manifest,
+        }
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as package:
+            package.writestr('course.json', json.dumps(manifest))
+            package.writestr('files/guia.pdf', b'%PDF' * 1000)
+            package.writestr('img/mapa.png', b'png')
+        buffer.seek(0)
+        return buffer
+
+    def test_import_creates_course_and_reports_errors(self):
+        result = import_package(self.package(), self.owner)
+        course = Course.objects.get()
+        self.assertEqual(result.course, course)
+        self.assertEqual([e['where'] for e in result.errors], [
+            'curso', 'módulo 1, contenido 5', 'módulo 1, contenido 6', 'módulo 2, contenido 1'])
+
+        self.assertEqual((course.module_count, course.content_count), (2, 4))
+        self.assertEqual(list(course.categories.values_list('name', flat=True)), ['Web'])
+        self.assertEqual(list(stale_counters()[1]), [])
+        outline = course_outline(course)
+        self.assertEqual([c.title for c in outline.modules[0].contents],
+                         ['Lectura 0', 'Video', 'Guía', 'Mapa'])
+
+        guide = Content.objects.get(slot=2).item
+        self.assertEqual(guide.file.read(), b'%PDF' * 1000)
+        self.assertTrue(os.path.exists(guide.file.path))
+
+    def test_queries_do_not_grow_with_lessons(self):
+        def count(lessons, slug):
+            with CaptureQueriesContext(connection) as queries:
+                import_package(self.package(lessons, slug=slug), self.owner)
+            return len(queries)
+
+        # the first import also creates the catalog facet rows
+        count(1, 'warm')
+        self.assertEqual(count(2, 'a'), count(40, 'b'))
+
+    def test_invalid_course_creates_nothing(self):
+        make_course(self.owner, 'Django')
+        with self.assertRaises(PackageError):
+            import_package(self.package(), self.owner)
+        self.assertEqual(Course.objects.count(), 1)
+        self.assertFalse(Text.objects.exists())
+
+    def test_endpoint(self):
+        self.client.force_login(self.owner)
+        url = reverse('instructor:course_import')
+        response = self.client.post(url, {'package': io.BytesIO(b'no zip')})
+        self.assertEqual(response.status_code, 400)
+
+        package = self.package()
+        package.name = 'curso.zip'
+        response = self.client.post(url, {'package': package})
+        self.assertContains(response, 'tipo desconocido')
+
+
+class CourseCloneTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(self.owner, 'Django')
+        self.course.categories.add(Category.objects.create(name='Web'))
+        self.modules = [Module.objects.create(course=self.course, title=t) for t in ('Uno', 'Dos')]
+
+    def add_lessons(self, count):
+        for i in range(count):
+            make_text(self.modules[i % 2], f'Lectura {i}')
+        item = File.objects.create(owner=self.owner, title='Guía', file='files/guia.pdf')
+        Content.objects.create(module=self.modules[1], item=item)
+
+    def test_copy_is_independent_and_shares_files(self):
+        self.add_lessons(3)
+        self.course.refresh_from_db()
+        copy = clone_course(self.course)
+
+        self.assertEqual(copy.slug, 'django-copia')
+        self.assertEqual(clone_course(self.course).slug, 'django-copia-2')
+        self.assertEqual(list(copy.categories.values_list('name', flat=True)), ['Web'])
+        self.assertEqual(list(stale_counters()[1]), [])
+
+        titles = [[c.title for c in m.contents] for m in course_outline(copy).modules]
+        self.assertEqual(titles, [[c.title for c in m.contents]
+                                  for m in course_outline(self.course).modules])
+        self.assertEqual(titles, [['Lectura 0', 'Lectura 2'], ['Lectura 1', 'Guía']])
+
+        def items(course):
+            return set(Content.objects.filter(module__course=course).values_list(
+                'content_type', 'object_id'))
+        self.assertFalse(items(copy) & items(self.course))
+        self.assertEqual(File.objects.filter(file='files/guia.pdf').count(), 3)
+
+    def test_copy_slugs_fit_the_column(self):
+        slug = 'curso-' + 'x' * 44
+        for _ in range(101):
+            make_course(self.owner, 'Copia', slug=_copy_slug(slug))
+        Course.objects.filter(slug=slug[:40] + '-copia-101').update(deleted_at=timezone.now())
+        copy = _copy_slug(slug)
+        self.assertEqual(copy, slug[:40] + '-copia-102')
+        self.assertEqual(len(copy), 50)
+
+    def test_queries_do_not_grow_with_lessons(self):
+        def count():
+            self.course.refresh_from_db()
+            with CaptureQueriesContext(connection) as queries:
+                clone_course(self.course)
+            return len(queries)
+
+        self.add_lessons(4)
+        before = count()
+        self.add_lessons(60)
+        self.assertEqual(count(), before)
+
+    def test_duplicate_action(self):
+        self.client.force_login(self.owner)
+        response = self.client.post(reverse('instructor:course_duplicate', args=[self.course.pk]))
+        copy = Course.objects.get(slug='django-copia')
+        self.assertRedirects(response, reverse('instructor:course_edit', args=[copy.pk]))
+
+        self.client.force_login(User.objects.create_user('eva', is_instructor=True))
+        response = self.client.post(reverse('instructor:course_duplicate', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.student = User.objects.create_user('luis')
+        self.course = make_course(self.owner, 'Django')
+        self.course.categories.add(Category.objects.create(name='Web'))
+        self.modules = [Module.objects.create(course=self.course, title=t) for t in ('Uno', 'Dos')]
+        self.contents = [make_text(module, f'Lectura {i}')
+                         for i, module in enumerate(self.modules * 2)]
+        Enrollment.objects.create(user=self.student, course=self.course)
+        Review.objects.create(user=self.student, course=self.course, rating=5)
+        for content in self.contents:
+            mark_completed(self.student, content)
+
+    def purge(self):
+        return purge_deleted(batch_size=2, grace=datetime.timedelta(0))
+
+    def test_deleted_content_is_hidden_at_once(self):
+        self.client.force_login(self.owner)
+        content = self.contents[0]
+        self.client.post(reverse('instructor:content_delete', args=[content.pk]))
+
+        self.course.refresh_from_db()
+        self.assertNotIn(content.pk, course_outline(self.course))
+        self.assertFalse(Content.objects.filter(pk=content.pk).exists())
+        self.assertEqual(course_progress(self.student, self.course).completed, 3)
+        self.assertEqual([list(q) for q in stale_counters()], [[], []])
+        # still there until the purge
+        self.assertTrue(Content.all_objects.filter(pk=content.pk).exists())
+        self.assertTrue(Text.objects.filter(pk=content.object_id).exists())
+
+        self.purge()
+        self.assertFalse(Content.all_objects.filter(pk=content.pk).exists())
+        self.assertFalse(CompletedContent.objects.filter(content=content.pk).exists())
+        self.assertFalse(Text.objects.filter(pk=content.object_id).exists())
+        self.assertEqual([list(q) for q in stale_counters()], [[], []])
+
+    def test_deleted_module(self):
+        delete_module(self.modules[0])
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.module_count, self.course.content_count), (1, 2))
+        self.assertEqual([m.id for m in course_outline(self.course).modules], [self.modules[1].pk])
+
+        self.purge()
+        self.assertEqual(Content.all_objects.filter(module__course=self.course).count(), 2)
+        self.assertEqual(Text.objects.count(), 2)
+        self.assertEqual([list(q) for q in stale_counters()], [[], []])
+
+    def test_deleted_course_is_purged_in_batches(self):
+        delete_course(self.course)
+        self.assertFalse(Course.objects.filter(pk=self.course.pk).exists())
+        self.assertEqual(catalog_facets(), {CatalogFacet.CATEGORY: [], CatalogFacet.LEVEL: []})
+
+        self.assertEqual(self.purge(), 20)
+        self.assertFalse(Course.all_objects.exists())
+        for model in (Module.all_objects, Content.all_objects, Enrollment.objects,
+                      Review.objects, CompletedContent.objects, CourseCompletion.objects, Text.objects):
+            self.assertFalse(model.exists())
+        # the facets were taken off once, when the course was hidden
+        self.assertFalse(CatalogFacet.objects.filter(count__lt=0).exists())
+
+    def test_deleted_course_frees_its_slug(self):
+        delete_course(self.course)
+        course = Course(owner=self.owner, title='Django', slug='django', overview='x',
+                        image='https://example.com/course.jpg', level='Principiante')
+        course.full_clean()
+        course.save()
+        self.assertEqual(Course.all_objects.get(pk=self.course.pk).slug,
+                         f'django--deleted-{self.course.pk}')
+
+    def test_shared_files_outlive_their_clones(self):
+        name = default_storage.save('files/guia.pdf', ContentFile(b'pdf'))
+        item = File.objects.create(owner=self.owner, title='Guía', file=name)
+        Content.objects.create(module=self.modules[0], item=item)
+        self.course.refresh_from_db()
+        copy = clone_course(self.course)
+
+        delete_course(self.course)
+        self.purge()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(File.objects.count(), 1)
+
+        delete_course(copy)
+        self.purge()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(File.objects.exists())
+
+
+class ModuleViewTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(self.owner, 'Django')
+        self.client.force_login(self.owner)
+
+    def test_create_edit_and_delete(self):
+        response = self.client.post(reverse('instructor:module_add', args=[self.course.pk]),
+                                    {'title': 'Uno', 'description': ''})
+        self.assertRedirects(response, reverse('instructor:module_list', args=[self.course.pk]),
+                             fetch_redirect_response=False)
+        module = Module.objects.get(course=self.course)
+        self.assertEqual(module.title, 'Uno')
+
+        response = self.client.post(reverse('instructor:module_edit', args=[module.pk]),
+                                    {'title': 'Primero', 'description': 'intro'})
+        self.assertRedirects(response, reverse('instructor:module_list', args=[self.course.pk]),
+                             fetch_redirect_response=False)
+        module.refresh_from_db()
+        self.assertEqual((module.title, module.description, module.deleted_at),
+                         ('Primero', 'intro', None))
+
+        self.client.post(reverse('instructor:module_delete', args=[module.pk]))
+        self.assertFalse(Module.objects.filter(pk=module.pk).exists())
+        self.assertTrue(Module.all_objects.filter(pk=module.pk).exists())
+
+
+class InstructorCourseListTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.client.force_login(self.owner)
+
+    def add_course(self, title, students):
+        course = make_course(self.owner, title)
+        module = Module.objects.create(course=course, title='Uno')
+        content = make_text(module)
+        for i in range(students):
+            student = User.objects.create_user(f'{title}-{i}')
+            Enrollment.objects.create(user=student, course=course)
+            if i % 2:
+                mark_completed(student, content)
+        Review.objects.create(user=self.owner, course=course, rating=4)
+        return course
+
+    def test_stats(self):
+        course = self.add_course('Django', 4)
+        CompletedContent.objects.filter(content__module__course=course).update(
+            completed_at=timezone.now() - datetime.timedelta(days=30))
+        mark_completed(User.objects.get(username='Django-0'), course.modules.get().contents.get())
+        # forget_slots() saving every bitmap of the course is not activity
+        CourseCompletion.objects.filter(course=course).update(updated_at=timezone.now())
+
+        response = self.client.get(reverse('instructor:course_list'))
+        listed = response.context['courses'][0]
+        self.assertEqual((listed.enrollment_count, listed.active_count, listed.module_count,
+                          listed.content_count, listed.rating), (4, 1, 1, 1, 4.0))
+
+    def test_query_count_does_not_grow_with_courses(self):
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('instructor:course_list'))
+            return len(queries)
+
+        self.add_course('Uno', 2)
+        before = count()
+        for title in ('Dos', 'Tres', 'Cuatro'):
+            self.add_course(title, 3)
+        self.assertEqual(count(), before)
+
+
+class LearnerProgressTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(self.owner, 'Django')
+        self.modules = [Module.objects.create(course=self.course, title=t) for t in ('Uno', 'Dos')]
+        self.contents = [[make_text(module, f'{module.title} {i}') for i in range(2)]
+                         for module in self.modules]
+        self.client.force_login(self.owner)
+
+    def add_student(self, name, completed):
+        student = User.objects.create_user(name)
+        Enrollment.objects.create(user=student, course=self.course)
+        for content in [c for contents in self.contents for c in contents][:completed]:
+            mark_completed(student, content)
+        return student
+
+    def test_matrix_and_summary(self):
+        for i, completed in enumerate((0, 1, 2, 3, 4)):
+            self.add_student(f'alumno{i}', completed)
+        response = self.client.get(reverse('instructor:learner_progress', args=[self.course.pk]))
+
+        rows = [(user.username, [done for done, _ in cells])
+                for user, cells in response.context['rows']]
+        self.assertEqual(rows[:3], [('alumno0', [0, 0]), ('alumno1', [1, 0]), ('alumno2', [2, 0])])
+
+        summary = response.context['summary']
+        self.assertEqual(summary.learners, 5)
+        self.assertEqual([(s, f, k) for _, s, f, k in summary.funnel], [(4, 3, 2), (2, 1, 2)])
+        self.assertEqual(summary.percentiles, [(25, 25.0), (50, 50.0), (75, 75.0), (90, 100.0)])
+
+    def test_csv(self):
+        self.add_student('luis', 3)
+        response = self.client.get(reverse('instructor:learner_progress_csv', args=[self.course.pk]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['usuario,nombre,Uno (2),Dos (2),completadas,porcentaje',
+                                 'luis,,2,1,3,75.0'])
+
+        self.client.force_login(User.objects.create_user('eva', is_instructor=True))
+        response = self.client.get(reverse('instructor:learner_progress', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_count_does_not_grow_with_learners(self):
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('instructor:learner_progress', args=[self.course.pk]))
+            return len(queries)
+
+        self.add_student('luis', 2)
+        count()
+        before = count()
+        for i in range(20):
+            self.add_student(f'alumno{i}', i % 5)
+        count()
+        self.assertEqual(count(), before)
+
+    def test_summary_is_cached_until_progress_changes(self):
+        student = self.add_student('luis', 1)
+        url = reverse('instructor:learner_progress', args=[self.course.pk])
+        self.assertEqual(self.client.get(url).context['summary'].histogram, {1: 1})
+        with mock.patch('apps.courses.learners.build_progress_summary') as build:
+            self.client.get(url)
+        build.assert_not_called()
+
+        mark_completed(student, self.contents[0][1])
+        self.assertEqual(self.client.get(url).context['summary'].histogram, {2: 1})
+        self.add_student('eva', 0)
+        self.assertEqual(self.client.get(url).context['summary'].learners, 2)
+
+
+@override_settings(ENGAGEMENT_ROLLUP_INTERVAL=None)
+class EngagementRollupTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.course = make_course(self.owner, 'Django')
+        module = Module.objects.create(course=self.course, title='Uno')
+        self.contents = [make_text(module, f'Lectura {i}') for i in range(3)]
+        self.today = timezone.localdate()
+
+    def activity(self, name, days_ago, completed=1, rating=None):
+        when = timezone.now() - datetime.timedelta(days=days_ago)
+        student = User.objects.create_user(name)
+        Enrollment.objects.create(user=student, course=self.course)
+        for content in self.contents[:completed]:
+            mark_completed(student, content)
+        if rating:
+            Review.objects.create(user=student, course=self.course, rating=rating)
+        for model, field in ((Enrollment, 'enrolled_at'), (CompletedContent, 'completed_at'),
+                             (Review, 'created_at')):
+            model.objects.filter(user=student).update(**{field: when})
+
+    def test_rollup_is_incremental(self):
+        self.activity('luis', 40, completed=2, rating=5)
+        self.activity('eva', 3, completed=3, rating=4)
+        self.activity('ines', 3, rating=4)
+        self.assertEqual(rollup_engagement(), 41)
+        self.assertEqual(RollupState.objects.get().day, self.today - datetime.timedelta(days=1))
+
+        day = CourseDailyStats.objects.get(day=self.today - datetime.timedelta(days=3))
+        self.assertEqual((day.enrollments, day.completions, day.active_learners, day.reviews,
+                          day.rating_4, day.rating_5), (2, 4, 2, 2, 2, 0))
+        self.assertEqual(CourseDailyStats.objects.get(
+            day=self.today - datetime.timedelta(days=40)).rating_5, 1)
+
+        # the next run starts at the high-water mark
+        self.activity('sara', 0)
+        self.assertEqual(rollup_engagement(), 2)
+        self.assertEqual(CourseDailyStats.objects.get(day=self.today).enrollments, 1)
+        self.assertEqual(CourseDailyStats.objects.count(), 3)
+
+    def test_dashboard_reads_only_rollups(self):
+        self.activity('luis', 1, completed=2, rating=5)
+        rollup_engagement()
+        self.client.force_login(self.owner)
+
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('instructor:analytics'), {'days': 7})
+            self.assertFalse([q for q in queries if 'courses_completedcontent' in q['sql']
+                              or 'courses_enrollment' in q['sql']])
+            return response, len(queries)
+
+        response, before = count()
+        [row] = response.context['per_course']
+        self.assertEqual((row['enrollments'], row['completions'], row['reviews']), (1, 2, 1))
+        self.assertEqual(response.context['histogram'][4], (5, 1))
+
+        for i in range(5):
+            self.activity(f'alumno{i}', i, completed=3)
+        rollup_engagement(self.today - datetime.timedelta(days=10))
+        self.assertEqual(count()[1], before)
+
+    def test_bad_period_falls_back(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('instructor:analytics'), {'days': 'abc'})
+        self.assertEqual(response.context['days'], 30)
+
+    def test_dashboard_refreshes_stale_rollups_only(self):
+        with override_settings(ENGAGEMENT_ROLLUP_INTERVAL=60), \
+                mock.patch('apps.courses.analytics.run_later') as run_later:
+            # no backfill from a web request
+            schedule_rollup(rollup_state())
+            run_later.assert_not_called()
+
+            rollup_engagement()
+            schedule_rollup(rollup_state())
+            run_later.assert_not_called()
+
+            RollupState.objects.update(updated_at=timezone.now() - datetime.timedelta(minutes=5))
+            schedule_rollup(rollup_state())
+            run_later.assert_called_once_with(0, rollup_engagement)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('ana', is_instructor=True)
+        self.admin = User.objects.create_user('root', is_staff=True)
+        self.courses = [make_course(self.owner, title) for title in ('Django', 'Flask')]
+        module = Module.objects.create(course=self.courses[0], title='Uno')
+        content = make_text(module)
+        for i in range(3):
+            student = User.objects.create_user(f'alumno{i}')
+            for course in self.courses:
+                Enrollment.objects.create(user=student, course=course)
+            mark_completed(student, content)
+            Review.objects.create(user=student, course=self.courses[0], rating=i + 3,
+                                  comment='bien, "claro"')
+        Enrollment.objects.filter(user__username='alumno0').update(
+            enrolled_at=timezone.now() - datetime.timedelta(days=10))
+
+    def get(self, name, format='csv', **params):
+        self.client.force_login(self.admin)
+        return self.client.get(reverse('exports:export', args=[name, format]), params)
+
+    def test_csv_filtered_by_course_and_dates(self):
+        since = (timezone.localdate() - datetime.timedelta(days=2)).isoformat()
+        response = self.get('enrollments', course=self.courses[0].pk, since=since)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,user_id,username,course_id,enrolled_at')
+        self.assertEqual([line.split(',')[2] for line in lines[1:]], ['alumno1', 'alumno2'])
+
+        response = self.get('reviews')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertIn('"bien, ""claro"""', lines[1])
+
+    def test_jsonl_and_gzip(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('exports:export', args=['completions', 'jsonl']),
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = [json.loads(line) for line in
+                gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual([row['username'] for row in rows], ['alumno0', 'alumno1', 'alumno2'])
+        self.assertEqual({row['course_id'] for row in rows}, {self.courses[0].pk})
+
+        for accept_encoding in ('gzip;q=0', 'deflate, gzip; q=0.0', 'gzipped'):
+            response = self.client.get(reverse('exports:export', args=['completions', 'jsonl']),
+                                       HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(reverse('exports:export', args=['completions', 'jsonl']),
+                                   HTTP_ACCEPT_ENCODING='br;q=1.0, GZIP;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_access_and_bad_filters(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('exports:export', args=['reviews', 'csv']))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get('reviews', since='ayer').status_code, 400)
+        self.assertEqual(self.get('users').status_code, 404)
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'enrollments.jsonl.gz')
+        call_command('export_data', 'enrollments', '--format', 'jsonl', '--gzip',
+                     '--course', str(self.courses[1].pk), '--output', path)
+        with gzip.open(path, 'rt') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['course_id'] for row in rows}, {self.courses[1].pk})
@@ -0,0 +1,8 @@
+from django.urls import path
+from ..views import exports
+
+app_name = 'exports'
+
+urlpatterns = [
+    path('<slug:name>.<slug:format>', exports.export, name="export"),
+]
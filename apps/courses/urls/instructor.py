@@ -5,9 +5,17 @@ app_name = 'instructor'
 
 urlpatterns = [
     path('courses/', instructor.CourseListView.as_view(), name="course_list"),
+    path('analytics/', instructor.AnalyticsView.as_view(), name="analytics"),
     path('course/create', instructor.CourseCreateView.as_view(), name="course_create"),
+    path('course/import/', instructor.CourseImportView.as_view(), name="course_import"),
     path('course/<int:pk>/edit/',
          instructor.CourseUpdateView.as_view(), name="course_edit"),
+    path('course/<int:pk>/duplicate/',
+         instructor.CourseDuplicateView.as_view(), name="course_duplicate"),
+    path('course/<int:pk>/progress/',
+         instructor.LearnerProgressView.as_view(), name="learner_progress"),
+    path('course/<int:pk>/progress.csv',
+         instructor.LearnerProgressCSVView.as_view(), name="learner_progress_csv"),
     path('course/<int:pk>/delete/',
          instructor.CourseDeleteView.as_view(), name="course_delete"),
     # Modules URLs
@@ -6,10 +6,16 @@ app_name = 'student'
 urlpatterns = [
     path("courses/", student.course_list, name="course_list"),  # /courses
     path("detail/<str:slug>", student.course_detail, name="course_detail"),
+    path("detail/<str:slug>/reviews/",
+         student.course_reviews, name="course_reviews"),
     path("<str:slug>/lessons/<int:content_id>/",
          student.course_lessons, name="course_lessons"),
     path("<str:slug>/lessons/", student.course_lessons, name="course_lessons"),
+    path("<str:slug>/lessons/search/", student.lesson_search, name="lesson_search"),
+    path("<str:slug>/enroll/", student.enroll_course, name="course_enroll"),
     path('content/<int:content_id>/complete/',
          student.mark_complete, name="mark_complete"),
+    path('content/<int:content_id>/complete.json',
+         student.mark_complete_json, name="mark_complete_json"),
     path("<slug:slug>/review/", student.review_course, name="review_course")
 ]
@@ -0,0 +1,53 @@
+import datetime
+import re
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from django.views.decorators.http import require_GET
+from ..exports import EXPORTS, FORMATS, export_chunks
+
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+
+
+def _date(value):
+    return datetime.date.fromisoformat(value) if value else None
+
+
+def _accepts_gzip(accept_encoding):
+    # gzip listed with a non-zero weight; "gzip;q=0" is a refusal
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() != 'gzip':
+            continue
+        if not params.strip():
+            return True
+        weight = re.fullmatch(r'\s*q\s*=\s*([01](?:\.\d{0,3})?)\s*', params)
+        return weight is not None and float(weight[1]) > 0
+    return False
+
+
+@require_GET
+@staff_member_required
+def export(request, name, format):
+    if name not in EXPORTS or format not in FORMATS:
+        raise Http404
+    try:
+        filters = {
+            'course': int(request.GET['course']) if request.GET.get('course') else None,
+            'since': _date(request.GET.get('since')),
+            'until': _date(request.GET.get('until')),
+        }
+    except ValueError:
+        return HttpResponseBadRequest("course debe ser un id y since/until fechas AAAA-MM-DD")
+
+    chunks = export_chunks(EXPORTS[name], format, **filters)
+    # compressed as it streams, for clients that accept it
+    gzipped = _accepts_gzip(request.headers.get('Accept-Encoding', ''))
+    response = StreamingHttpResponse(
+        compress_sequence(chunks) if gzipped else chunks, content_type=CONTENT_TYPES[format])
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{format}"'
+    return response
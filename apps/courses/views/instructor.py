@@ -1,13 +1,25 @@
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView, View
 from ..models import Course, Module, Content, Text, Image, File, Video
 from django.urls import reverse, reverse_lazy
 from django.shortcuts import get_object_or_404, render, redirect
 from django.forms.models import modelform_factory
 from django.contrib.contenttypes.models import ContentType
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import (HttpResponseForbidden, HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
+from django.utils import timezone
 from django.utils.decorators import method_decorator
+from ..pagination import CursorPaginationMixin
+from django.db import transaction
+from ..outline import bump_outline_version, course_outline
+from ..packages import PackageError, import_package
+from ..analytics import engagement, rollup_state, schedule_rollup
+from ..cloning import clone_course
+from ..learners import (learners, module_completion, module_masks, progress_csv_rows,
+                        progress_summary)
+from ..purge import delete_content, delete_course, delete_module
+import datetime
 import json
 
 CONTENT_MODELS = {
@@ -16,6 +28,8 @@ CONTENT_MODELS = {
     'file': File,
     'video': Video
 }
+# students who completed a lesson this recently count as active
+ACTIVE_STUDENT_WINDOW = datetime.timedelta(days=7)
 
 
 class InstructorRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -23,14 +37,15 @@ class InstructorRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
         return self.request.user.is_instructor
 
 
-class CourseListView(InstructorRequiredMixin, ListView):
+class CourseListView(InstructorRequiredMixin, CursorPaginationMixin, ListView):
     model = Course
     template_name = 'instructor/course_list.html'
     context_object_name = "courses"
     paginate_by = 8
 
     def get_queryset(self):
-        return Course.objects.filter(owner=self.request.user)
+        active_since = timezone.now() - ACTIVE_STUDENT_WINDOW
+        return Course.objects.filter(owner=self.request.user).with_stats(active_since)
 
 
 class CourseCreateView(InstructorRequiredMixin, CreateView):
@@ -64,6 +79,105 @@ class CourseDeleteView(InstructorRequiredMixin, DeleteView):
     def get_queryset(self):
         return Course.objects.filter(owner=self.request.user)
 
+    def form_valid(self, form):
+        # hidden now, purged in the background
+        delete_course(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class LearnerProgressView(InstructorRequiredMixin, CursorPaginationMixin, ListView):
+    template_name = 'instructor/learner_progress.html'
+    context_object_name = 'learners'
+    paginate_by = 50
+
+    def get_queryset(self):
+        self.course = get_object_or_404(
+            Course, pk=self.kwargs['pk'], owner=self.request.user)
+        return learners(self.course)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        outline = course_outline(self.course)
+        masks = module_masks(outline)
+        context.update(
+            course=self.course,
+            modules=outline.modules,
+            rows=[(enrollment.user,
+                   list(zip(module_completion(enrollment.bits, masks), outline.modules)))
+                  for enrollment in context['learners']],
+            summary=progress_summary(self.course, outline),
+        )
+        return context
+
+
+class LearnerProgressCSVView(InstructorRequiredMixin, View):
+    def get(self, request, pk):
+        course = get_object_or_404(Course, pk=pk, owner=request.user)
+        response = StreamingHttpResponse(
+            progress_csv_rows(course, course_outline(course)), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="progreso-{course.slug}.csv"'
+        return response
+
+
+class AnalyticsView(InstructorRequiredMixin, TemplateView):
+    template_name = 'instructor/analytics.html'
+    periods = (7, 30, 90)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        days = self.request.GET.get('days', '')
+        days = int(days) if days.isdigit() else 30
+        if days not in self.periods:
+            days = 30
+        courses = Course.objects.filter(owner=self.request.user)
+        course_id = self.request.GET.get('course')
+        if course_id and course_id.isdigit():
+            courses = courses.filter(pk=course_id)
+
+        per_course, per_day, histogram = engagement(
+            courses, timezone.localdate() - datetime.timedelta(days=days - 1))
+        peak = max([day['completions'] for day in per_day], default=0)
+        for day in per_day:
+            day['height'] = day['completions'] * 100 // peak if peak else 0
+        # the page reads the rollups only; they are refreshed in the background
+        state = rollup_state()
+        schedule_rollup(state)
+
+        context.update(
+            days=days, periods=self.periods, per_course=per_course, per_day=per_day,
+            histogram=histogram, course_id=course_id,
+            courses=Course.objects.filter(owner=self.request.user).values('id', 'title'),
+            rolled_up_until=state.day if state else None,
+        )
+        return context
+
+
+class CourseDuplicateView(InstructorRequiredMixin, View):
+    def post(self, request, pk):
+        course = get_object_or_404(Course, pk=pk, owner=request.user)
+        copy = clone_course(course, request.user)
+        return redirect('instructor:course_edit', copy.pk)
+
+
+class CourseImportView(InstructorRequiredMixin, View):
+    template_name = 'instructor/course_import.html'
+
+    def get(self, request):
+        return render(request, self.template_name)
+
+    def post(self, request):
+        package = request.FILES.get('package')
+        if package is None:
+            return render(request, self.template_name, {'error': 'Selecciona un archivo ZIP'})
+        try:
+            result = import_package(package, request.user)
+        except PackageError as e:
+            return render(request, self.template_name, {'error': str(e)}, status=400)
+
+        if not result.errors:
+            return redirect('instructor:module_list', result.course.id)
+        return render(request, self.template_name, {'result': result})
+
 # Module Views
 
 
@@ -120,6 +234,10 @@ class ModuleDeleteView(InstructorRequiredMixin, DeleteView):
     def get_success_url(self):
         return reverse('instructor:module_list', args=[self.object.course.id])
 
+    def form_valid(self, form):
+        delete_module(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
 # Content
 
 
@@ -129,9 +247,9 @@ class ContentListView(InstructorRequiredMixin, ListView):
     context_object_name = "contents"
 
     def get_queryset(self):
-        self.module = get_object_or_404(
-            Module, id=self.kwargs['module_id'], course__owner=self.request.user)
-        return self.module.contents.all().select_related('content_type').order_by('order')
+        self.module = get_object_or_404(Module.objects.select_related('course'),
+                                        id=self.kwargs['module_id'], course__owner=self.request.user)
+        return self.module.contents.with_items('title').order_by('order')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -196,33 +314,95 @@ class ContentDeleteView(InstructorRequiredMixin, DeleteView):
     def get_success_url(self):
         return reverse('instructor:content_list', args=[self.object.module.id])
 
+    def form_valid(self, form):
+        delete_content(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+def single_move(current, order):
+    # the id that was dragged if ``order`` is ``current`` with one item moved
+    changed = [i for i, (a, b) in enumerate(zip(current, order)) if a != b]
+    if not changed:
+        return None
+    first, last = changed[0], changed[-1]
+    if order[first] == current[last] and order[first + 1:last + 1] == current[first:last]:
+        return order[first]
+    if order[last] == current[first] and order[first:last] == current[first + 1:last + 1]:
+        return order[last]
+    return None
+
+
+class OrderView(InstructorRequiredMixin, View):
+    """
+    Applies a drag-and-drop permutation of all the children of one parent in
+    a single UPDATE. The client sends the course outline_version it rendered
+    and gets the new one back; a reorder based on a stale page is rejected.
+    """
+    model = None
+    parent_field = None
+    course_field = None
 
-class ModuleOrderView(InstructorRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         try:
             data = json.loads(request.body)
-            order = data.get('order', [])
-
-            # {2,3,4,5} -> {0: 4,1: 2,5,3}
-            for index, module_id in enumerate(order):
-                modules = Module.objects.filter(
-                    id=module_id, course__owner=request.user).update(order=index)
-
-            return JsonResponse({'status': 'ok'})
-        except Exception as e:
+            if not isinstance(data, dict):
+                raise ValueError('Se esperaba un objeto JSON')
+            order = [int(pk) for pk in data.get('order', [])]
+            version = data.get('version')
+            version = int(version) if version is not None else None
+        except (TypeError, ValueError) as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        if not order or len(set(order)) != len(order):
+            return JsonResponse({'status': 'error', 'message': 'Orden inválido'}, status=400)
+
+        # ownership is checked once for the whole list
+        parents = set(self.model.objects.filter(
+            pk__in=order, **{f'{self.course_field}__owner': request.user}
+        ).values_list(f'{self.parent_field}_id', f'{self.course_field}_id'))
+        if len(parents) != 1:
+            return JsonResponse({'status': 'error', 'message': 'Orden inválido'}, status=400)
+        (parent_id, course_id), = parents
+
+        with transaction.atomic():
+            current = Course.objects.select_for_update().filter(pk=course_id).values_list(
+                'outline_version', flat=True).get()
+            if version is not None and version != current:
+                return JsonResponse({'status': 'stale', 'version': str(current)}, status=409)
+
+            siblings = {sibling.pk: sibling for sibling in self.model.objects.filter(
+                **{self.parent_field: parent_id}).order_by('order', 'pk').only('pk', 'order')}
+            if set(siblings) != set(order):
+                return JsonResponse({'status': 'error', 'message': 'Orden inválido'}, status=400)
+
+            if list(siblings) == order:
+                return JsonResponse({'status': 'ok', 'version': str(current)})
+
+            field = self.model._meta.get_field('order')
+            moved = single_move(list(siblings), order)
+            if moved is not None:
+                # a drag of one item only rewrites that item's rank
+                index = order.index(moved)
+                field.move(siblings[moved],
+                           siblings[order[index - 1]] if index > 0 else None,
+                           siblings[order[index + 1]] if index + 1 < len(order) else None)
+            else:
+                self.model.objects.bulk_update(
+                    [self.model(pk=pk, order=field.rank(index)) for index, pk in enumerate(order)],
+                    ['order'])
+            # update() sends no signals: invalidate the outline once
+            version = bump_outline_version(pk=course_id)
+
+        # as a string, the 62-bit stamp does not fit in a JavaScript number
+        return JsonResponse({'status': 'ok', 'version': str(version)})
+
+
+class ModuleOrderView(OrderView):
+    model = Module
+    parent_field = 'course'
+    course_field = 'course'
 
 
-class ContentOrderView(InstructorRequiredMixin, View):
-    def post(self, request, *args, **kwargs):
-        try:
-            data = json.loads(request.body)
-            order = data.get('order', [])
-
-            # {2,3,4,5} -> {0: 4,1: 2,5,3}
-            for index, content_id in enumerate(order):
-                Content.objects.filter(
-                    id=content_id, module__course__owner=request.user).update(order=index)
-            return JsonResponse({'status': 'ok'})
-        except Exception as e:
-            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+class ContentOrderView(OrderView):
+    model = Content
+    parent_field = 'module'
+    course_field = 'module__course'
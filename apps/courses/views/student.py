@@ -1,18 +1,36 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from django.template.loader import render_to_string
 from ..models.course import Course
 from ..models.enrollment import Enrollment
-from ..models.progress_tracking import CompletedContent
 from ..models.content import Content
-from ..models.progress import Progress
 from ..models.review import Review
-from django.db.models import Q
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from ..forms import ReviewForm
-from django.db.models import Avg, Count
+from .. import enrollments
+from ..search import search_courses
+from ..pagination import CursorPaginator
+from ..facets import catalog_facets, link_facets
+from ..progress import course_progress, save_progress
+from ..completion import mark_completed
+from ..outline import course_outline
+from ..lesson_search import lesson_index
+from django.http import Http404
+from django.core.exceptions import PermissionDenied
+from django.urls import reverse
+from django.db import transaction
 # Create your views here.
 
+REVIEWS_PER_PAGE = 10
+
+
+def course_reviews_queryset(course):
+    # walks the (course, created_at, id) index newest first
+    return (Review.objects.filter(course=course).select_related("user")
+            .order_by("-created_at", "-id"))
+
 
 @login_required
 def course_list(request):
@@ -20,132 +38,190 @@ def course_list(request):
     query = request.GET.get("q")
     filter_type = request.GET.get("filter", "all")
 
+    courses = Course.objects.for_catalog()
     if filter_type == "enrolled":
-        courses = Course.objects.filter(enrollment__user=request.user)
+        courses = courses.enrolled_by(request.user)
     elif filter_type == "not_enrolled":
-        courses = Course.objects.exclude(enrollment__user=request.user)
-    else:
-        courses = Course.objects.all()
+        courses = courses.not_enrolled_by(request.user)
+
+    category = request.GET.get("category")
+    level = request.GET.get("level")
+    if category and category.isdigit():
+        courses = courses.filter(categories=category)
+    if level:
+        courses = courses.filter(level=level)
 
     if query:
-        courses = courses.filter(
-            Q(title__icontains=query) | Q(owner__first_name__icontains=query)
-        )
+        courses = search_courses(courses, query)
 
-    paginator = Paginator(courses, 8)
-    page_number = request.GET.get("page")
-    courses_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(courses, 8, with_count=True)
+    courses_obj = paginator.page(request.GET.get("cursor"))
 
     query_params = request.GET.copy()
-    if "page" in query_params:
-        query_params.pop("page")
+    if "cursor" in query_params:
+        query_params.pop("cursor")
     query_string = query_params.urlencode()
 
     return render(request, "courses/courses.html", {
         'courses_obj': courses_obj,
         'query': query,
         'query_string': query_string,
-        "filter_type": filter_type
+        "filter_type": filter_type,
+        "facets": link_facets(request.GET, catalog_facets())
     })
 
 
 @login_required
 def course_detail(request, slug):
     course = get_object_or_404(Course, slug=slug)
-    modules = course.modules.prefetch_related('contents').order_by('order')
-    total_contents = sum(module.contents.count() for module in modules)
+    modules = course_outline(course).modules
+    total_contents = course.content_count
 
-    is_enrolled = Enrollment.objects.filter(
-        user=request.user, course=course).exists()
+    is_enrolled = enrollments.is_enrolled(request.user, course)
 
-    reviews = (Review.objects.filter(course=course).select_related(
-        "user").order_by("-created_at"))
-
-    stats = reviews.aggregate(avg=Avg("rating"), total=Count("id"))
+    reviews = CursorPaginator(course_reviews_queryset(course), REVIEWS_PER_PAGE).page()
 
     return render(request, 'courses/course_detail.html', {
         'course': course,
         'modules': modules,
         'total_contents': total_contents,
         'is_enrolled': is_enrolled,
-        'stats': stats,
         'reviews': reviews
     })
 
 
 @login_required
-def course_lessons(request, slug, content_id=None):
+def course_reviews(request, slug):
     course = get_object_or_404(Course, slug=slug)
-    course_title = course.title
-    modules = course.modules.prefetch_related('contents').order_by('order')
+    paginator = CursorPaginator(course_reviews_queryset(course), REVIEWS_PER_PAGE)
+    reviews = paginator.page(request.GET.get("cursor"))
 
-    request.session['last_course_slug'] = course.slug
-    request.session['last_course_title'] = course.title
-    request.session['last_course_image'] = course.image
+    return JsonResponse({
+        'html': render_to_string('courses/includes/review_items.html', {'reviews': reviews}, request),
+        'next': reviews.next_cursor
+    })
 
-    request.session.modified = True
 
-    # Enrollemnt
-    Enrollment.objects.get_or_create(user=request.user, course=course)
+@login_required
+def course_lessons(request, slug, content_id=None):
+    course = get_object_or_404(Course, slug=slug)
+    course_title = course.title
 
-    # get all contents
-    all_contents = [c for m in modules for c in m.contents.all()]
-    total_contents = len(all_contents)
+    # enrolling is an explicit POST now (enroll_course)
+    if not enrollments.is_enrolled(request.user, course):
+        messages.info(request, "Inscríbete para acceder a las lecciones.")
+        return redirect("student:course_detail", slug=course.slug)
 
-    completed = CompletedContent.objects.filter(
-        user=request.user, content__in=all_contents).values_list('content_id', flat=True)
+    # only touch the session (and its row) when the course changes
+    if request.session.get('last_course_slug') != course.slug:
+        request.session['last_course_slug'] = course.slug
+        request.session['last_course_title'] = course.title
+        request.session['last_course_image'] = course.image
 
-    # progress by module
-    for module in modules:
-        module.completed_count = module.contents.filter(
-            id__in=completed).count()
-        module.total_count = module.contents.count()
+    outline = course_outline(course)
+    progress = course_progress(request.user, course)
+
+    # the outline is shared between requests, so the per-user counts go
+    # alongside it instead of onto it
+    modules = [(module, *progress.for_module(module.id)) for module in outline.modules]
 
     current_content = None
     if content_id:
+        if content_id not in outline:
+            raise Http404
         current_content = get_object_or_404(
-            Content, id=content_id, module__course=course)
-
-    progress = (len(completed) / total_contents * 100) if total_contents else 0
+            Content.objects.select_related('content_type'), id=content_id, module__course=course)
 
-    Progress.objects.update_or_create(
-        user=request.user,
-        course=course,
-        defaults={'progress': progress}
-    )
+    save_progress(request.user, course, progress.percent)
 
     return render(request, 'courses/course_lessons.html',
                   {
                       'course_title': course_title,
                       'modules': modules,
                       'course': course,
-                      'completed_ids': set(completed),
+                      'completed_ids': progress.completed_ids,
                       'current_content': current_content,
-                      'progress': int(progress)
+                      'progress': int(progress.percent)
                   })
 
 
 @login_required
+def lesson_search(request, slug):
+    course = get_object_or_404(Course, slug=slug)
+    if not enrollments.is_enrolled(request.user, course):
+        raise PermissionDenied
+
+    results = lesson_index(course).search(request.GET.get("q", ""))
+    return JsonResponse({'results': [{
+        'id': content.id,
+        'title': content.title,
+        'url': reverse('student:course_lessons', args=[course.slug, content.id]),
+    } for content in results]})
+
+
+@login_required
+@require_POST
+def enroll_course(request, slug):
+    course = get_object_or_404(Course, slug=slug)
+    Enrollment.objects.get_or_create(user=request.user, course=course)
+    return redirect('student:course_lessons', slug=course.slug)
+
+
+def _complete_content(request, content_id):
+    content = get_object_or_404(
+        Content.objects.select_related('module__course'), id=content_id)
+    course = content.module.course
+    if not enrollments.is_enrolled(request.user, course):
+        raise PermissionDenied
+    try:
+        mark_completed(request.user, content)
+    except Course.DoesNotExist:
+        # the course was deleted since the content was read
+        raise Http404
+    return content, course
+
+
+@login_required
+@require_POST
 def mark_complete(request, content_id):
-    content = get_object_or_404(Content, id=content_id)
-    CompletedContent.objects.get_or_create(user=request.user, content=content)
+    content, course = _complete_content(request, content_id)
+    next_content_id = course_outline(course).next_content_id(content.id)
 
-    next_content = Content.objects.filter(
-        module=content.module,
-        order__gt=content.order
-    ).order_by('order').first()
+    if next_content_id:
+        return redirect('student:course_lessons', slug=course.slug, content_id=next_content_id)
 
-    if next_content:
-        return redirect('student:course_lessons', slug=content.module.course.slug, content_id=next_content.id)
+    return redirect('student:course_lessons', slug=course.slug)
 
-    return redirect('student:course_lessons', slug=content.module.course.slug)
 
+@login_required
+@require_POST
+def mark_complete_json(request, content_id):
+    # same as mark_complete, but answers with the new progress so the
+    # lessons page can update in place instead of being rendered again
+    try:
+        content, course = _complete_content(request, content_id)
+    except PermissionDenied:
+        # the page reads the answer as JSON, an HTML 403 would break it
+        return JsonResponse(
+            {'error': "Inscríbete en el curso para marcar lecciones."}, status=403)
+    next_content_id = course_outline(course).next_content_id(content.id)
+
+    progress = course_progress(request.user, course)
+    save_progress(request.user, course, progress.percent)
+    completed, total = progress.for_module(content.module_id)
+
+    return JsonResponse({
+        'content': content.id,
+        'module': {'id': content.module_id, 'completed': completed, 'total': total},
+        'progress': int(progress.percent),
+        'next': next_content_id,
+        'next_url': reverse('student:course_lessons', args=[course.slug, next_content_id])
+        if next_content_id else None,
+    })
 
-def user_is_enrolled(user, course: Course) -> bool:
-    is_enrolled = Enrollment.objects.filter(
-        user=user, course=course).exists()
 
-    return is_enrolled or user.is_staff
+def user_is_enrolled(user, course: Course) -> bool:
+    return enrollments.is_enrolled(user, course) or user.is_staff
 
 
 def review_course(request, slug):
@@ -169,16 +245,9 @@ def review_course(request, slug):
             review = form.save(commit=False)
             review.user = request.user
             review.course = course
-            review.save()
-
-            reviews = (
-                Review.objects.filter(course=course).select_related(
-                    "user").order_by("-created_at")
-            )
-
-            stats = reviews.aggregate(avg=Avg("rating"), total=Count("id"))
-            course.rating = stats['avg']
-            course.save()
+            # the course rating is adjusted by the Review signals
+            with transaction.atomic():
+                review.save()
 
             message = "Gracias por tu reseña" if not is_update else "Reseña actualizada"
             messages.success(request, message)
@@ -5,8 +5,7 @@ from apps.profiles.models import Profile
 
 
 def index(request):
-    courses = Course.objects.filter(
-        enrollment__user=request.user).order_by('?')[:3]
+    courses = Course.objects.enrolled_by(request.user).order_by('?')[:3]
 
     profile = Profile.objects.get(user=request.user)
 
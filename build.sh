@@ -12,4 +12,13 @@ python manage.py collectstatic --no-input
 # Apply any outstanding database migrations
 python manage.py migrate
 
-python manage.py loaddata data.json
\ No newline at end of file
+python manage.py loaddata data.json
+
+python manage.py rebuild_search_index
+
+python manage.py rebuild_catalog_facets
+
+python manage.py rebuild_counters
+python manage.py rebuild_completions
+python manage.py rollup_engagement
+
@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
@@ -156,6 +157,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'profiles.User'
 
+# seconds to let a burst of course edits settle before the stored progress
+# of its students is recomputed; empty to leave it to refresh_progress
+PROGRESS_REFRESH_DELAY = os.getenv("PROGRESS_REFRESH_DELAY", "30")
+PROGRESS_REFRESH_DELAY = float(PROGRESS_REFRESH_DELAY) if PROGRESS_REFRESH_DELAY else None
+
+# seconds between a course, module or content being deleted (hidden at once)
+# and the background purge of its rows; empty to leave it to purge_deleted
+PURGE_DELAY = os.getenv("PURGE_DELAY", "60")
+PURGE_DELAY = float(PURGE_DELAY) if PURGE_DELAY else None
+
+# age in seconds at which an analytics dashboard view brings the daily
+# engagement rollups up to date in the background; empty to leave it to
+# rollup_engagement
+ENGAGEMENT_ROLLUP_INTERVAL = os.getenv("ENGAGEMENT_ROLLUP_INTERVAL", "900")
+ENGAGEMENT_ROLLUP_INTERVAL = (
+    float(ENGAGEMENT_ROLLUP_INTERVAL) if ENGAGEMENT_ROLLUP_INTERVAL else None)
+
 LOGIN_REDIRECT_URL = "student:course_list"
 LOGOUT_REDIRECT_URL = "login"
 LOGIN_URL = "login"